@@ -1,68 +1,307 @@
+from collections import defaultdict
+
 from django.contrib import admin
+from django.contrib.admin.views.main import PAGE_VAR
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from django.utils.translation import gettext_lazy as _
 
+from foodmanager import counters, feed, shopping_totals
 from foodmanager.models import (Ingredient, User, Recipe,
                                 Favorite, RecipeIngredient,
-                                Subscription, ShoppingCart)
+                                Subscription, ShoppingCart,
+                                ShoppingCartTotal, ShoppingListExport)
+
+from .pagination import CachedCountPaginator
+
+
+class RelatedIdFilter(admin.FieldListFilter):
+    """Фильтр по id связанного объекта. В отличие от стандартного
+    фильтра по внешнему ключу не выбирает все значения для боковой
+    панели.
+    """
+
+    template = 'admin/related_id_filter.html'
+
+    def __init__(self, field, request, params, model, model_admin,
+                 field_path):
+        self.lookup_kwarg = f'{field_path}__id__exact'
+        self.lookup_val = params.get(self.lookup_kwarg)
+        self.hidden_params = [
+            (name, value) for name, value in request.GET.items()
+            if name not in (self.lookup_kwarg, PAGE_VAR)
+        ]
+        super().__init__(
+            field, request, params, model, model_admin, field_path
+        )
+
+    def has_output(self):
+        return True
+
+    def expected_parameters(self):
+        return [self.lookup_kwarg]
+
+    def choices(self, changelist):
+        yield {
+            'selected': self.lookup_val is None,
+            'query_string': changelist.get_query_string(
+                remove=[self.lookup_kwarg]
+            ),
+            'display': _('Все'),
+        }
+
+
+def related_count(model, field):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{field: OuterRef('pk')})
+            .order_by()
+            .values(field)
+            .annotate(total=Count('pk'))
+            .values('total')
+        ),
+        0
+    )
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Список без точного COUNT по всей таблице: число строк кэшируется
+    (на больших таблицах PostgreSQL — оценка планировщика), а общее число
+    при фильтрации не считается.
+    """
+
+    paginator = CachedCountPaginator
+    show_full_result_count = False
 
 
 @admin.register(Ingredient)
-class IngredientAdmin(admin.ModelAdmin):
-    list_display = ('id', 'name', 'measurement_unit')
-    search_fields = ('name',)
-    list_filter = ('name',)
+class IngredientAdmin(LargeTableAdmin):
+    list_display = ('id', 'name', 'measurement_unit', 'recipes_count')
+    search_fields = ('^name',)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            recipes_count=related_count(RecipeIngredient, 'ingredient')
+        )
+
+    def recipes_count(self, obj):
+        return obj.recipes_count
+
+    recipes_count.short_description = _('Количество рецептов')
 
 
 @admin.register(User)
-class UserAdmin(admin.ModelAdmin):
-    list_display = ('id', 'username', 'email', 'first_name', 'last_name')
-    search_fields = ('username', 'email', 'first_name', 'last_name')
-    list_filter = ('username', 'email')
+class UserAdmin(LargeTableAdmin):
+    list_display = ('id', 'username', 'email', 'first_name', 'last_name',
+                    'recipes_count', 'subscribers_count')
+    search_fields = ('^username', '^email', '^last_name')
+    list_filter = ('is_staff', 'is_active')
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            recipes_count=related_count(Recipe, 'author'),
+            subscribers_count=related_count(Subscription, 'author')
+        )
+
+    def recipes_count(self, obj):
+        return obj.recipes_count
+
+    recipes_count.short_description = _('Количество рецептов')
+
+    def subscribers_count(self, obj):
+        return obj.subscribers_count
+
+    subscribers_count.short_description = _('Количество подписчиков')
 
 
 @admin.register(Recipe)
-class RecipeAdmin(admin.ModelAdmin):
+class RecipeAdmin(LargeTableAdmin):
     class RecipeIngredientInline(admin.TabularInline):
         model = RecipeIngredient
         min_num = 1
         extra = 1
+        autocomplete_fields = ('ingredient',)
 
     list_display = ('id', 'name', 'author', 'cooking_time',
-                    'favorites_count')
-    list_filter = ('author', 'name')
-    search_fields = ('name', 'author__username', 'author__email')
+                    'favorites_count', 'in_carts_count')
+    list_filter = (('author', RelatedIdFilter),)
+    list_select_related = ('author',)
+    search_fields = ('name', '=author__username')
+    autocomplete_fields = ('author',)
     inlines = (RecipeIngredientInline,)
-    readonly_fields = ('favorites_count',)
+    readonly_fields = ('favorites_count', 'in_carts_count')
 
-    def favorites_count(self, obj):
-        return obj.favorited_by.count()
+    def ingredient_amounts(self, recipe):
+        return dict(
+            recipe.recipe_ingredients.values_list(
+                'ingredient_id', 'amount'
+            ).order_by()
+        )
 
-    favorites_count.short_description = _('Количество добавлений в избранное')
+    def save_related(self, request, form, formsets, change):
+        recipe = form.instance
+        old_amounts = self.ingredient_amounts(recipe) if change else {}
+        super().save_related(request, form, formsets, change)
+        shopping_totals.change_recipe(
+            recipe.pk,
+            shopping_totals.amount_deltas(
+                old_amounts, self.ingredient_amounts(recipe)
+            )
+        )
 
 
 @admin.register(Favorite)
-class FavoriteAdmin(admin.ModelAdmin):
+class FavoriteAdmin(LargeTableAdmin):
     list_display = ('id', 'user', 'recipe')
-    search_fields = ('user__username', 'recipe__name')
-    list_filter = ('user', 'recipe')
+    search_fields = ('=user__username',)
+    list_filter = (('user', RelatedIdFilter), ('recipe', RelatedIdFilter))
+    list_select_related = ('user', 'recipe')
+    autocomplete_fields = ('user', 'recipe')
+
+    def save_model(self, request, obj, form, change):
+        if change:
+            counters.change(Favorite, [form.initial['recipe']], -1)
+        super().save_model(request, obj, form, change)
+        counters.change(Favorite, [obj.recipe_id], 1)
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        counters.change(Favorite, [obj.recipe_id], -1)
+
+    def delete_queryset(self, request, queryset):
+        recipe_ids = list(queryset.values_list('recipe_id', flat=True))
+        super().delete_queryset(request, queryset)
+        counters.remove_links(Favorite, recipe_ids)
 
 
 @admin.register(RecipeIngredient)
-class RecipeIngredientAdmin(admin.ModelAdmin):
+class RecipeIngredientAdmin(LargeTableAdmin):
     list_display = ('id', 'recipe', 'ingredient', 'amount')
-    search_fields = ('recipe__name', 'ingredient__name')
-    list_filter = ('recipe', 'ingredient')
+    search_fields = ('^ingredient__name',)
+    list_filter = (
+        ('recipe', RelatedIdFilter), ('ingredient', RelatedIdFilter)
+    )
+    list_select_related = ('recipe', 'ingredient')
+    autocomplete_fields = ('recipe', 'ingredient')
+    ordering = ('-id',)
+
+    def ingredient_amounts(self, recipe_ids):
+        return {
+            recipe_id: shopping_totals.recipe_amounts([recipe_id])
+            for recipe_id in set(recipe_ids)
+        }
+
+    def recipes_changed(self, old_amounts):
+        """Переносит изменения ингредиентов рецептов в итоги списков
+        покупок.
+        """
+        for recipe_id, amounts in old_amounts.items():
+            shopping_totals.change_recipe(
+                recipe_id,
+                shopping_totals.amount_deltas(
+                    amounts, shopping_totals.recipe_amounts([recipe_id])
+                )
+            )
+
+    def save_model(self, request, obj, form, change):
+        recipe_ids = [obj.recipe_id]
+        if change:
+            recipe_ids.append(form.initial['recipe'])
+        old_amounts = self.ingredient_amounts(recipe_ids)
+        super().save_model(request, obj, form, change)
+        self.recipes_changed(old_amounts)
+
+    def delete_model(self, request, obj):
+        old_amounts = self.ingredient_amounts([obj.recipe_id])
+        super().delete_model(request, obj)
+        self.recipes_changed(old_amounts)
+
+    def delete_queryset(self, request, queryset):
+        old_amounts = self.ingredient_amounts(
+            queryset.values_list('recipe_id', flat=True)
+        )
+        super().delete_queryset(request, queryset)
+        self.recipes_changed(old_amounts)
 
 
 @admin.register(Subscription)
-class SubscriptionAdmin(admin.ModelAdmin):
+class SubscriptionAdmin(LargeTableAdmin):
     list_display = ('user', 'author')
-    list_filter = ('user', 'author')
-    search_fields = ('user__username', 'author__username')
+    list_filter = (('user', RelatedIdFilter), ('author', RelatedIdFilter))
+    list_select_related = ('user', 'author')
+    search_fields = ('=user__username', '=author__username')
+    autocomplete_fields = ('user', 'author')
+
+    def save_model(self, request, obj, form, change):
+        if change and form.changed_data:
+            feed.unfollow(form.initial['user'], form.initial['author'])
+        super().save_model(request, obj, form, change)
+        if change and form.changed_data:
+            feed.follow(obj.user_id, obj.author_id)
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        feed.unfollow(obj.user_id, obj.author_id)
+
+    def delete_queryset(self, request, queryset):
+        pairs = list(queryset.values_list('user_id', 'author_id'))
+        super().delete_queryset(request, queryset)
+        for user_id, author_id in pairs:
+            feed.unfollow(user_id, author_id)
 
 
 @admin.register(ShoppingCart)
-class ShoppingCartAdmin(admin.ModelAdmin):
+class ShoppingCartAdmin(LargeTableAdmin):
     list_display = ('id', 'user', 'recipe')
-    search_fields = ('user__username', 'recipe__name')
-    list_filter = ('user', 'recipe')
+    search_fields = ('=user__username',)
+    list_filter = (('user', RelatedIdFilter), ('recipe', RelatedIdFilter))
+    list_select_related = ('user', 'recipe')
+    autocomplete_fields = ('user', 'recipe')
+
+    def save_model(self, request, obj, form, change):
+        if change:
+            shopping_totals.remove_recipes(
+                form.initial['user'], [form.initial['recipe']]
+            )
+        super().save_model(request, obj, form, change)
+        shopping_totals.add_recipes(obj.user_id, [obj.recipe_id])
+        if change:
+            counters.change(ShoppingCart, [form.initial['recipe']], -1)
+        counters.change(ShoppingCart, [obj.recipe_id], 1)
+
+    def delete_model(self, request, obj):
+        shopping_totals.remove_recipes(obj.user_id, [obj.recipe_id])
+        super().delete_model(request, obj)
+        counters.change(ShoppingCart, [obj.recipe_id], -1)
+
+    def delete_queryset(self, request, queryset):
+        carts = defaultdict(list)
+        for user_id, recipe_id in queryset.values_list('user_id', 'recipe_id'):
+            carts[user_id].append(recipe_id)
+        for user_id, recipe_ids in carts.items():
+            shopping_totals.remove_recipes(user_id, recipe_ids)
+        super().delete_queryset(request, queryset)
+        counters.remove_links(
+            ShoppingCart,
+            [recipe_id for recipe_ids in carts.values()
+             for recipe_id in recipe_ids]
+        )
+
+
+@admin.register(ShoppingCartTotal)
+class ShoppingCartTotalAdmin(LargeTableAdmin):
+    list_display = ('id', 'user', 'ingredient', 'amount')
+    search_fields = ('=user__username',)
+    list_filter = (('user', RelatedIdFilter),)
+    list_select_related = ('user', 'ingredient')
+    raw_id_fields = ('user', 'ingredient')
+    ordering = ('-id',)
+
+
+@admin.register(ShoppingListExport)
+class ShoppingListExportAdmin(LargeTableAdmin):
+    list_display = ('id', 'user', 'status', 'created_at', 'finished_at')
+    list_filter = ('status',)
+    search_fields = ('=user__username',)
+    list_select_related = ('user',)
+    raw_id_fields = ('user',)
@@ -0,0 +1,92 @@
+import gzip
+from hashlib import sha256
+from threading import Lock
+
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from foodmanager.catalogue import prefix_index
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+CONTENT_TYPE = 'application/json'
+
+
+class RenderedCatalogue:
+    """Полный список ингредиентов, заранее отрендеренный в JSON,
+    со сжатыми вариантами. У каждого варианта свой сильный ETag:
+    хеш содержимого и название сжатия."""
+
+    def __init__(self, rows, version):
+        self.version = version
+        self.body = JSONRenderer().render(rows)
+        digest = sha256(self.body).hexdigest()[:32]
+        self.bodies = {
+            'identity': self.body,
+            'gzip': gzip.compress(self.body, compresslevel=9, mtime=0),
+        }
+        if brotli is not None:
+            self.bodies['br'] = brotli.compress(self.body)
+        self.etags = {
+            coding: f'"{digest}"' if coding == 'identity'
+            else f'"{digest}-{coding}"'
+            for coding in self.bodies
+        }
+
+    def choose_encoding(self, accept_encoding):
+        accepted = set()
+        for item in accept_encoding.split(','):
+            coding, _, params = item.strip().partition(';')
+            if params.strip().replace(' ', '') in ('q=0', 'q=0.0'):
+                continue
+            accepted.add(coding.strip().lower())
+        for coding in ('br', 'gzip'):
+            if coding not in self.bodies:
+                continue
+            if coding in accepted or '*' in accepted:
+                return coding
+        return 'identity'
+
+    def matches(self, if_none_match, coding):
+        etag = self.etags[coding]
+        tags = {tag.strip() for tag in if_none_match.split(',')}
+        return '*' in tags or etag in tags or f'W/{etag}' in tags
+
+
+catalogue_lock = Lock()
+current_catalogue = None
+
+
+def rendered_catalogue():
+    global current_catalogue
+    index = prefix_index()
+    catalogue = current_catalogue
+    if catalogue is not None and catalogue.version == index.version:
+        return catalogue
+    with catalogue_lock:
+        if current_catalogue is None or (
+            current_catalogue.version != index.version
+        ):
+            current_catalogue = RenderedCatalogue(index.rows, index.version)
+        return current_catalogue
+
+
+def catalogue_response(request):
+    catalogue = rendered_catalogue()
+    coding = catalogue.choose_encoding(
+        request.headers.get('Accept-Encoding', '')
+    )
+    if catalogue.matches(request.headers.get('If-None-Match', ''), coding):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(
+            catalogue.bodies[coding], content_type=CONTENT_TYPE
+        )
+        if coding != 'identity':
+            response['Content-Encoding'] = coding
+    response['ETag'] = catalogue.etags[coding]
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
@@ -0,0 +1,143 @@
+from datetime import timedelta
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.utils import timezone
+from foodmanager import shopping_totals
+from foodmanager.models import ShoppingListExport
+
+from .pdf import shopping_list_pdf
+
+ACTIVE_STATUSES = (ShoppingListExport.PENDING, ShoppingListExport.RUNNING)
+
+
+def enqueue(user):
+    """Ставит выгрузку в очередь или возвращает уже активную выгрузку
+    пользователя, чтобы один пользователь не занимал несколько слотов.
+    """
+    active = user.shopping_list_exports.filter(
+        status__in=ACTIVE_STATUSES
+    ).first()
+    if active is not None:
+        return active, False
+    return ShoppingListExport.objects.create(user=user), True
+
+
+def claim(limit):
+    """Переводит до ``limit`` ожидающих выгрузок в работу и возвращает
+    пары ``(id, аренда)``. Условное UPDATE гарантирует, что выгрузку
+    заберёт только один обработчик; закончить её сможет только владелец
+    аренды.
+    """
+    claimed = []
+    candidates = (
+        ShoppingListExport.objects
+        .filter(status=ShoppingListExport.PENDING)
+        .order_by('created_at', 'id')
+        .values_list('pk', flat=True)
+    )
+    for pk in candidates[:limit * 2]:
+        if len(claimed) == limit:
+            break
+        lease = uuid4()
+        now = timezone.now()
+        updated = ShoppingListExport.objects.filter(
+            pk=pk, status=ShoppingListExport.PENDING
+        ).update(
+            status=ShoppingListExport.RUNNING,
+            lease=lease,
+            started_at=now,
+            heartbeat_at=now
+        )
+        if updated:
+            claimed.append((pk, lease))
+    return claimed
+
+
+def heartbeat(leases):
+    """Продлевает аренды выполняющихся выгрузок."""
+    if not leases:
+        return 0
+    return ShoppingListExport.objects.filter(
+        status=ShoppingListExport.RUNNING, lease__in=leases
+    ).update(heartbeat_at=timezone.now())
+
+
+def run(export_id, lease):
+    """Строит PDF выгрузки. Выполняется в процессе пула.
+
+    Результат записывается, только если аренда ``lease`` всё ещё у этого
+    обработчика; иначе файл удаляется, а выгрузку заканчивает тот, кто
+    забрал её повторно.
+    """
+    export = ShoppingListExport.objects.get(pk=export_id)
+    status, error = ShoppingListExport.DONE, ''
+    try:
+        content = shopping_list_pdf(
+            shopping_totals.shopping_list(export.user_id)
+        )
+        export.file.save(
+            f'{uuid4().hex}.pdf', ContentFile(content), save=False
+        )
+    except Exception as exception:
+        status, error = ShoppingListExport.FAILED, repr(exception)
+    finished = ShoppingListExport.objects.filter(
+        pk=export_id, status=ShoppingListExport.RUNNING, lease=lease
+    ).update(
+        status=status,
+        file=export.file.name or '',
+        error=error,
+        finished_at=timezone.now(),
+        lease=None
+    )
+    if not finished:
+        if export.file:
+            export.file.delete(save=False)
+        return None
+    return status
+
+
+def requeue_stale():
+    """Возвращает в очередь выгрузки, обработчик которых перестал
+    продлевать аренду.
+    """
+    deadline = timezone.now() - timedelta(
+        seconds=settings.SHOPPING_LIST_EXPORT_TIMEOUT
+    )
+    return ShoppingListExport.objects.filter(
+        status=ShoppingListExport.RUNNING, heartbeat_at__lt=deadline
+    ).update(
+        status=ShoppingListExport.PENDING,
+        lease=None,
+        started_at=None,
+        heartbeat_at=None
+    )
+
+
+def expire():
+    """Удаляет завершённые выгрузки старше
+    ``SHOPPING_LIST_EXPORT_TTL`` секунд вместе с файлами.
+    """
+    deadline = timezone.now() - timedelta(
+        seconds=settings.SHOPPING_LIST_EXPORT_TTL
+    )
+    expired = ShoppingListExport.objects.filter(
+        status__in=(ShoppingListExport.DONE, ShoppingListExport.FAILED),
+        finished_at__lt=deadline
+    )
+    removed = 0
+    for export in expired.iterator(chunk_size=500):
+        if export.file:
+            export.file.delete(save=False)
+        export.delete()
+        removed += 1
+    return removed
+
+
+def expires_at(export):
+    if export.finished_at is None:
+        return None
+    return export.finished_at + timedelta(
+        seconds=settings.SHOPPING_LIST_EXPORT_TTL
+    )
@@ -0,0 +1,77 @@
+import multiprocessing
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from api import exports
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from foodmanager.utils import setup_django
+
+
+class Command(BaseCommand):
+    help = (
+        'Выполняет выгрузки списков покупок из очереди в пуле процессов '
+        'и удаляет устаревшие файлы выгрузок.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int,
+            default=settings.SHOPPING_LIST_EXPORT_WORKERS,
+            help='Число одновременно выполняемых выгрузок.'
+        )
+        parser.add_argument(
+            '--poll-interval', type=float, default=1.0,
+            help='Пауза между проверками очереди в секундах.'
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Обработать текущую очередь и завершиться.'
+        )
+
+    def handle(self, *args, **options):
+        workers = max(options['workers'], 1)
+        interval = options['poll_interval']
+        running = {}
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=setup_django
+        ) as executor:
+            while True:
+                exports.heartbeat(
+                    [lease for _, lease in running.values()]
+                )
+                exports.requeue_stale()
+                removed = exports.expire()
+                if removed:
+                    self.stdout.write(f'Удалено выгрузок: {removed}')
+
+                for export_id, lease in exports.claim(
+                    workers - len(running)
+                ):
+                    future = executor.submit(exports.run, export_id, lease)
+                    running[future] = (export_id, lease)
+                if not running:
+                    if options['once']:
+                        return
+                    time.sleep(interval)
+                    continue
+
+                done, _ = wait(
+                    running, timeout=interval, return_when=FIRST_COMPLETED
+                )
+                for future in done:
+                    export_id, _ = running.pop(future)
+                    error = future.exception()
+                    if error is not None:
+                        self.stderr.write(f'Выгрузка {export_id}: {error!r}')
+                    elif future.result() is None:
+                        self.stderr.write(
+                            f'Выгрузка {export_id}: аренда потеряна, '
+                            'результат отброшен'
+                        )
+                    else:
+                        self.stdout.write(
+                            f'Выгрузка {export_id}: {future.result()}'
+                        )
@@ -0,0 +1,252 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as Base64Error
+from hashlib import sha256
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet, ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+COUNT_CACHE_PREFIX = 'paginator-count'
+
+
+class CachedCountPaginator(Paginator):
+    """Paginator, который кэширует ``count`` по SQL-сигнатуре выборки.
+
+    Для выборки без условий по таблице крупнее
+    ``PAGINATION_COUNT_ESTIMATE_THRESHOLD`` строк на PostgreSQL берётся
+    оценка планировщика из ``pg_class.reltuples``. Число может отставать
+    от реального на ``PAGINATION_COUNT_CACHE_TIMEOUT`` секунд, поэтому
+    страница режется по ``per_page``, а не по ``count``.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        count_query = queryset.order_by().values('pk').query
+        try:
+            sql, params = count_query.sql_with_params()
+        except EmptyResultSet:
+            return 0
+        key = '{}:{}'.format(
+            COUNT_CACHE_PREFIX,
+            sha256(repr((queryset.db, sql, params)).encode()).hexdigest()
+        )
+        count = cache.get(key)
+        if count is None:
+            count = self.estimated_count()
+            if count is None:
+                count = queryset.count()
+            cache.set(key, count, settings.PAGINATION_COUNT_CACHE_TIMEOUT)
+        return count
+
+    def estimated_count(self):
+        queryset = self.object_list
+        query = queryset.query
+        connection = connections[queryset.db]
+        if (
+            connection.vendor != 'postgresql'
+            or query.where
+            or query.distinct
+            or query.is_sliced
+        ):
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class '
+                'WHERE oid = to_regclass(%s)',
+                [connection.ops.quote_name(queryset.model._meta.db_table)]
+            )
+            row = cursor.fetchone()
+        if (
+            row is None
+            or row[0] < settings.PAGINATION_COUNT_ESTIMATE_THRESHOLD
+        ):
+            return None
+        return row[0]
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        return self._get_page(
+            self.object_list[bottom:bottom + self.per_page], number, self
+        )
+
+
+class LimitPageNumberPagination(PageNumberPagination):
+    django_paginator_class = CachedCountPaginator
+    page_size_query_param = 'limit'
+
+
+class KeysetPagination(LimitPageNumberPagination):
+    """Постраничный вывод по номеру страницы или, если в запросе есть
+    параметр ``cursor``, по ключу сортировки без COUNT и OFFSET.
+
+    Порядок задаётся атрибутом ``cursor_ordering`` представления и должен
+    однозначно упорядочивать строки. Первая страница запрашивается с
+    пустым ``cursor``, следующие — по ссылкам ``next`` и ``previous``.
+    """
+
+    cursor_query_param = 'cursor'
+    cursor_ordering = ('-created_at', '-id')
+    invalid_cursor_message = 'Неверный курсор.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = self.is_keyset(request)
+        if not self.keyset:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.ordering = getattr(view, 'cursor_ordering', self.cursor_ordering)
+        self.fields = [
+            queryset.model._meta.get_field(name.lstrip('-'))
+            for name in self.ordering
+        ]
+        page_size = self.get_page_size(request)
+        position, reverse = self.decode_cursor(
+            request.query_params.get(self.cursor_query_param, '')
+        )
+
+        ordering = self.ordering
+        if reverse:
+            ordering = [self.invert(name) for name in ordering]
+        rows = self.fetch(queryset, ordering, position, page_size + 1)
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+        self.page = rows
+        return rows
+
+    def is_keyset(self, request):
+        return self.cursor_query_param in request.query_params
+
+    def fetch(self, queryset, ordering, position, size):
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self.seek(ordering, position))
+        return list(queryset[:size])
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super().get_paginated_response(data)
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_next_link(self):
+        if not self.keyset:
+            return super().get_next_link()
+        if not self.has_next or not self.page:
+            return None
+        return self.cursor_link(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.keyset:
+            return super().get_previous_link()
+        if not self.has_previous or not self.page:
+            return None
+        return self.cursor_link(self.page[0], reverse=True)
+
+    @staticmethod
+    def invert(name):
+        return name[1:] if name.startswith('-') else f'-{name}'
+
+    def seek(self, ordering, position):
+        """Условие «строго после ``position``» в порядке ``ordering``.
+
+        Первое поле дополнительно ограничено нестрогим неравенством, чтобы
+        база могла читать составной индекс диапазоном.
+        """
+        names = [name.lstrip('-') for name in ordering]
+        lookups = [
+            'lt' if name.startswith('-') else 'gt' for name in ordering
+        ]
+        condition = Q()
+        for index, name in enumerate(names):
+            condition |= Q(
+                **{names[i]: position[i] for i in range(index)},
+                **{f'{name}__{lookups[index]}': position[index]}
+            )
+        return Q(**{f'{names[0]}__{lookups[0]}e': position[0]}) & condition
+
+    def cursor_link(self, row, reverse):
+        payload = {
+            'p': [field.value_to_string(row) for field in self.fields],
+        }
+        if reverse:
+            payload['r'] = 1
+        cursor = urlsafe_b64encode(
+            json.dumps(payload, separators=(',', ':')).encode()
+        ).decode()
+        url = remove_query_param(
+            self.request.build_absolute_uri(), self.page_query_param
+        )
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def decode_cursor(self, cursor):
+        if not cursor:
+            return None, False
+        try:
+            payload = json.loads(urlsafe_b64decode(cursor.encode()))
+            values = payload['p']
+            if len(values) != len(self.fields):
+                raise ValueError
+            position = [
+                field.to_python(value)
+                for field, value in zip(self.fields, values)
+            ]
+            return position, bool(payload.get('r'))
+        except (
+            Base64Error, KeyError, TypeError, ValueError, ValidationError
+        ):
+            raise NotFound(self.invalid_cursor_message)
+
+
+class MergedKeysetPagination(KeysetPagination):
+    """Постраничный вывод по ключу сортировки, собранный из нескольких
+    выборок ключей. Параметр ``cursor`` необязателен.
+
+    Представление возвращает из ``get_keyset_sources()`` пары
+    ``(выборка, поля)``: поля соответствуют ``cursor_ordering`` без
+    знаков, последнее из них — id объекта из ``queryset``. Все поля
+    ``cursor_ordering`` должны сортироваться в одном направлении. Из
+    каждой выборки читается не больше страницы ключей, а объекты
+    загружаются одним запросом из ``queryset``.
+    """
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.sources = view.get_keyset_sources()
+        return super().paginate_queryset(queryset, request, view)
+
+    def is_keyset(self, request):
+        return True
+
+    def fetch(self, queryset, ordering, position, size):
+        signs = ['-' if name.startswith('-') else '' for name in ordering]
+        keys = set()
+        for source, names in self.sources:
+            source_ordering = [
+                sign + name for sign, name in zip(signs, names)
+            ]
+            source = source.order_by(*source_ordering)
+            if position is not None:
+                source = source.filter(self.seek(source_ordering, position))
+            keys.update(source.values_list(*names)[:size])
+        keys = sorted(keys, reverse=bool(signs[0]))[:size]
+        objects = queryset.in_bulk([key[-1] for key in keys])
+        return [objects[key[-1]] for key in keys if key[-1] in objects]
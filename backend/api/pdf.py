@@ -0,0 +1,105 @@
+from hashlib import sha256
+from io import BytesIO
+from threading import Lock
+
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+from .caching import LRUCache
+
+PDF_FONT = 'Arial'
+PDF_FONT_PATH = 'Arial.ttf'
+PDF_TITLE = 'Список покупок'
+PDF_FILENAME = 'shopping_list.pdf'
+PDF_TITLE_FONT_SIZE = 14
+PDF_TEXT_FONT_SIZE = 12
+PDF_START_Y = 750
+PDF_BOTTOM_MARGIN = 50
+PDF_LINE_HEIGHT = 25
+PDF_FIRST_PAGE_Y = 800
+PDF_PAGE_WIDTH, PDF_PAGE_HEIGHT = A4
+PDF_CACHE_MAX_ENTRIES = 256
+PDF_CACHE_MAX_BYTES = 32 * 1024 * 1024
+
+rendered_lists = LRUCache(PDF_CACHE_MAX_ENTRIES, PDF_CACHE_MAX_BYTES)
+font_lock = Lock()
+
+
+def register_font():
+    if PDF_FONT in pdfmetrics.getRegisteredFontNames():
+        return
+    with font_lock:
+        if PDF_FONT not in pdfmetrics.getRegisteredFontNames():
+            pdfmetrics.registerFont(TTFont(PDF_FONT, PDF_FONT_PATH))
+
+
+def shopping_list_key(ingredients):
+    digest = sha256()
+    for item in ingredients:
+        digest.update(
+            f"{item['ingredient__name']}\t"
+            f"{item['ingredient__measurement_unit']}\t"
+            f"{item['total']}\n".encode()
+        )
+    return digest.hexdigest()
+
+
+def write_shopping_list_pdf(ingredients, stream):
+    register_font()
+    pdf = canvas.Canvas(stream, pagesize=A4)
+
+    pdf.setFont(PDF_FONT, PDF_TITLE_FONT_SIZE)
+    pdf.drawString(30, PDF_FIRST_PAGE_Y, PDF_TITLE)
+
+    pdf.setFont(PDF_FONT, PDF_TEXT_FONT_SIZE)
+    y_position = PDF_START_Y
+
+    for i, item in enumerate(ingredients, 1):
+        line = (
+            f"{i}. {item['ingredient__name']} - "
+            f"{item['total']} {item['ingredient__measurement_unit']}"
+        )
+        pdf.drawString(30, y_position, line)
+        y_position -= PDF_LINE_HEIGHT
+
+        if y_position <= PDF_BOTTOM_MARGIN:
+            pdf.showPage()
+            pdf.setFont(PDF_FONT, PDF_TEXT_FONT_SIZE)
+            y_position = PDF_FIRST_PAGE_Y
+
+    pdf.showPage()
+    pdf.save()
+
+
+def shopping_list_pdf(ingredients):
+    """Возвращает PDF списка покупок в виде байтов, например для файла
+    выгрузки. Использует тот же кэш, что и ``render_shopping_list``.
+    """
+    ingredients = list(ingredients)
+    key = shopping_list_key(ingredients)
+    content = rendered_lists.get(key)
+    if content is None:
+        stream = BytesIO()
+        write_shopping_list_pdf(ingredients, stream)
+        content = stream.getvalue()
+        rendered_lists.set(key, content)
+    return content
+
+
+def render_shopping_list(ingredients, response):
+    """Пишет PDF списка покупок прямо в ``response``.
+
+    Готовые документы кэшируются по хэшу агрегированного содержимого,
+    поэтому повторная выгрузка неизменного списка не рендерит PDF заново.
+    """
+    ingredients = list(ingredients)
+    key = shopping_list_key(ingredients)
+    content = rendered_lists.get(key)
+    if content is None:
+        write_shopping_list_pdf(ingredients, response)
+        rendered_lists.set(key, response.content)
+    else:
+        response.write(content)
+    return response
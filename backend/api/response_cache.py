@@ -0,0 +1,53 @@
+from hashlib import sha256
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+
+KEY_PREFIX = 'recipe-response'
+
+
+def response_cache():
+    alias = settings.RESPONSE_CACHE_ALIAS
+    return caches[alias] if alias else None
+
+
+def cache_key(request, versions):
+    digest = sha256(
+        f'{request.accepted_media_type}\n'
+        f'{request.build_absolute_uri()}'.encode()
+    ).hexdigest()
+    return ':'.join((KEY_PREFIX, *versions, digest))
+
+
+def cached_response(request, versions, render):
+    """Отдаёт анонимному пользователю готовый JSON из кэша ответов.
+
+    ``versions`` — функция, возвращающая версии данных ответа (``None`` —
+    не кэшировать); после изменения данных ключ меняется, поэтому
+    устаревший ответ не найдётся. ``render`` строит ответ, если в кэше
+    его нет.
+    """
+    cache = response_cache()
+    if (
+        cache is None
+        or request.user.is_authenticated
+        or request.accepted_renderer.format != 'json'
+    ):
+        return render()
+    current = versions()
+    if current is None:
+        return render()
+    key = cache_key(request, current)
+    hit = cache.get(key)
+    if hit is not None:
+        content, content_type = hit
+        return HttpResponse(content, content_type=content_type)
+    response = render()
+    if response.status_code == 200:
+        response.add_post_render_callback(
+            lambda rendered: cache.set(
+                key, (rendered.content, rendered['Content-Type'])
+            )
+        )
+    return response
@@ -2,14 +2,26 @@ from base64 import b64decode
 
 from django.contrib.auth import get_user_model
 from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
 from django.core.validators import MinValueValidator, MaxValueValidator
-from foodmanager.models import (Ingredient, Recipe, RecipeIngredient, Subscription)
+from django.db import transaction
+from foodmanager import shopping_totals
+from foodmanager.recipe_index import refresh_recipe_index
+from foodmanager.models import (Ingredient, Recipe, RecipeIngredient,
+                                ShoppingListExport, Subscription)
 from rest_framework import serializers
+from rest_framework.reverse import reverse
+from rest_framework.settings import api_settings
+
+from . import exports
 
 User = get_user_model()
 
 MIN_VALID = 1
 MAX_VALID = 32000
+MAX_BULK_IDS = 1000
+MAX_CAN_COOK_INGREDIENTS = 50
+MAX_CAN_COOK_LIMIT = 100
 
 
 class IngredientSerializer(serializers.ModelSerializer):
@@ -18,6 +30,38 @@ class IngredientSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'measurement_unit')
 
 
+class RenditionsField(serializers.ReadOnlyField):
+    """Ссылки на уменьшенные копии изображения ``{размер: {формат: url}}``.
+
+    Пока копии текущего файла не построены, возвращает ``None``.
+    """
+
+    def __init__(self, image_field, **kwargs):
+        self.image_field = image_field
+        super().__init__(**kwargs)
+
+    def get_attribute(self, instance):
+        renditions = super().get_attribute(instance) or {}
+        image = getattr(instance, self.image_field)
+        if not image or renditions.get('source') != image.name:
+            return None
+        return renditions
+
+    def to_representation(self, renditions):
+        request = self.context.get('request')
+        urls = {}
+        for name, paths in renditions.items():
+            if name == 'source':
+                continue
+            urls[name] = {}
+            for extension, path in paths.items():
+                url = default_storage.url(path)
+                if request is not None:
+                    url = request.build_absolute_uri(url)
+                urls[name][extension] = url
+        return urls
+
+
 class UserCreateSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True)
 
@@ -32,13 +76,16 @@ class UserCreateSerializer(serializers.ModelSerializer):
 
 class UserSerializer(serializers.ModelSerializer):
     is_subscribed = serializers.SerializerMethodField()
+    avatar_renditions = RenditionsField('avatar')
 
     class Meta:
         model = User
         fields = ('email', 'id', 'username', 'first_name', 'last_name',
-                  'is_subscribed', 'avatar')
+                  'is_subscribed', 'avatar', 'avatar_renditions')
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         request = self.context.get('request')
         if not request or request.user.is_anonymous:
             return False
@@ -70,9 +117,7 @@ class Base64ImageField(serializers.ImageField):
 
 
 class IngredientCreateSerializer(serializers.ModelSerializer):
-    id = serializers.PrimaryKeyRelatedField(
-        queryset=Ingredient.objects.all(),
-    )
+    id = serializers.IntegerField()
     amount = serializers.IntegerField(
         validators=[
             MinValueValidator(MIN_VALID),
@@ -110,6 +155,19 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError(
                 'Ингредиенты не должны повторяться.'
             )
+
+        found = set(
+            Ingredient.objects.filter(pk__in=ingredient_ids)
+            .values_list('pk', flat=True).order_by()
+        )
+        missing = [
+            str(ingredient_id) for ingredient_id in ingredient_ids
+            if ingredient_id not in found
+        ]
+        if missing:
+            raise serializers.ValidationError(
+                f'Ингредиенты не найдены: {", ".join(missing)}.'
+            )
         return value
 
     def validate(self, data):
@@ -125,25 +183,72 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
             recipe_ingredients.append(
                 RecipeIngredient(
                     recipe=recipe,
-                    ingredient=ingredient_data['id'],
+                    ingredient_id=ingredient_data['id'],
                     amount=ingredient_data['amount']
                 )
             )
         RecipeIngredient.objects.bulk_create(recipe_ingredients)
+        refresh_recipe_index([recipe.id])
 
     def create(self, validated_data):
+        """Рецепт и его ингредиенты фиксируются одной транзакцией, чтобы
+        версия рецепта в кэше ответов менялась уже после ингредиентов.
+        """
         ingredients_data = validated_data.pop('ingredients')
-        recipe = Recipe.objects.create(**validated_data)
-        self.create_ingredients(recipe, ingredients_data)
+        with transaction.atomic():
+            recipe = Recipe.objects.create(**validated_data)
+            self.create_ingredients(recipe, ingredients_data)
         return recipe
 
-    def update(self, instance, validated_data):
-        if 'ingredients' in validated_data:
-            ingredients_data = validated_data.pop('ingredients')
-            instance.recipe_ingredients.all().delete()
-            self.create_ingredients(instance, ingredients_data)
+    def update_ingredients(self, recipe, ingredients_data):
+        """Приводит ингредиенты рецепта к ``ingredients_data``, трогая
+        только изменившиеся строки, и переносит разницу в итоги списков
+        покупок.
+        """
+        existing = {
+            row.ingredient_id: row
+            for row in recipe.recipe_ingredients.order_by()
+        }
+        new_amounts = {
+            item['id']: item['amount'] for item in ingredients_data
+        }
+        to_create, to_update = [], []
+        for ingredient_id, amount in new_amounts.items():
+            row = existing.get(ingredient_id)
+            if row is None:
+                to_create.append(RecipeIngredient(
+                    recipe=recipe, ingredient_id=ingredient_id, amount=amount
+                ))
+            elif row.amount != amount:
+                to_update.append(row)
+        to_delete = [
+            row.pk for ingredient_id, row in existing.items()
+            if ingredient_id not in new_amounts
+        ]
+        if not (to_create or to_update or to_delete):
+            return
+
+        old_amounts = {
+            ingredient_id: row.amount
+            for ingredient_id, row in existing.items()
+        }
+        for row in to_update:
+            row.amount = new_amounts[row.ingredient_id]
+        RecipeIngredient.objects.bulk_create(to_create)
+        RecipeIngredient.objects.bulk_update(to_update, ['amount'])
+        RecipeIngredient.objects.filter(pk__in=to_delete).delete()
+        refresh_recipe_index([recipe.id])
+        shopping_totals.change_recipe(
+            recipe.id, shopping_totals.amount_deltas(old_amounts, new_amounts)
+        )
 
-        return super().update(instance, validated_data)
+    def update(self, instance, validated_data):
+        with transaction.atomic():
+            if 'ingredients' in validated_data:
+                self.update_ingredients(
+                    instance, validated_data.pop('ingredients')
+                )
+            return super().update(instance, validated_data)
 
     def to_representation(self, instance):
         return RecipeSerializer(
@@ -174,30 +279,145 @@ class RecipeSerializer(serializers.ModelSerializer):
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
     image = Base64ImageField()
+    image_renditions = RenditionsField('image')
 
     class Meta:
         model = Recipe
         fields = ('id', 'author', 'ingredients', 'is_favorited',
-                  'is_in_shopping_cart', 'name', 'image', 'text',
-                  'cooking_time')
+                  'is_in_shopping_cart', 'name', 'image', 'image_renditions',
+                  'text', 'cooking_time')
+
+    def to_representation(self, instance):
+        if hasattr(instance, 'author_is_subscribed'):
+            instance.author.is_subscribed = instance.author_is_subscribed
+        return super().to_representation(instance)
 
     def get_is_favorited(self, obj):
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         request = self.context.get('request')
         if not request or request.user.is_anonymous:
             return False
         return request.user.favorites.filter(recipe=obj).exists()
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         request = self.context.get('request')
         if not request or request.user.is_anonymous:
             return False
         return request.user.shopping_cart.filter(recipe=obj).exists()
 
 
+class FastRecipeSerializer(serializers.BaseSerializer):
+    """Только чтение: то же представление, что у ``RecipeSerializer``, но
+    словари собираются напрямую из загруженных объектов, без полей DRF.
+
+    Рассчитан на выборку ``RecipeViewSet.get_queryset`` с аннотациями
+    ``ANNOTATIONS``; рецепт без них отдаётся через ``RecipeSerializer``.
+    Ссылки на файлы и авторы запоминаются на время одного ответа.
+    """
+
+    ANNOTATIONS = ('is_favorited', 'is_in_shopping_cart',
+                   'author_is_subscribed')
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.urls = {}
+        self.authors = {}
+
+    def url(self, storage, path):
+        key = (storage, path)
+        url = self.urls.get(key)
+        if url is None:
+            url = storage.url(path)
+            request = self.context.get('request')
+            if request is not None:
+                url = request.build_absolute_uri(url)
+            self.urls[key] = url
+        return url
+
+    def file(self, value):
+        if not value:
+            return None
+        if not api_settings.UPLOADED_FILES_USE_URL:
+            return value.name
+        return self.url(value.storage, value.name)
+
+    def renditions(self, image, renditions):
+        if not image or not renditions or (
+            renditions.get('source') != image.name
+        ):
+            return None
+        return {
+            name: {
+                extension: self.url(default_storage, path)
+                for extension, path in paths.items()
+            }
+            for name, paths in renditions.items() if name != 'source'
+        }
+
+    def author(self, user, is_subscribed):
+        key = (user.pk, is_subscribed)
+        data = self.authors.get(key)
+        if data is None:
+            data = self.authors[key] = {
+                'email': user.email,
+                'id': user.pk,
+                'username': user.username,
+                'first_name': user.first_name,
+                'last_name': user.last_name,
+                'is_subscribed': is_subscribed,
+                'avatar': self.file(user.avatar),
+                'avatar_renditions': self.renditions(
+                    user.avatar, user.avatar_renditions
+                ),
+            }
+        return data
+
+    def to_representation(self, recipe):
+        if not all(hasattr(recipe, name) for name in self.ANNOTATIONS):
+            return RecipeSerializer(
+                context=self.context
+            ).to_representation(recipe)
+        return {
+            'id': recipe.pk,
+            'author': self.author(recipe.author, recipe.author_is_subscribed),
+            'ingredients': [
+                {
+                    'id': item.ingredient.id,
+                    'name': item.ingredient.name,
+                    'measurement_unit': item.ingredient.measurement_unit,
+                    'amount': item.amount,
+                }
+                for item in recipe.recipe_ingredients.all()
+            ],
+            'is_favorited': recipe.is_favorited,
+            'is_in_shopping_cart': recipe.is_in_shopping_cart,
+            'name': recipe.name,
+            'image': self.file(recipe.image),
+            'image_renditions': self.renditions(
+                recipe.image, recipe.image_renditions
+            ),
+            'text': recipe.text,
+            'cooking_time': recipe.cooking_time,
+        }
+
+
 class RecipeMinSerializer(serializers.ModelSerializer):
+    image_renditions = RenditionsField('image')
+
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_renditions', 'cooking_time')
+
+
+class CanCookRecipeSerializer(RecipeMinSerializer):
+    matched = serializers.IntegerField(read_only=True)
+    total = serializers.IntegerField(read_only=True)
+
+    class Meta(RecipeMinSerializer.Meta):
+        fields = RecipeMinSerializer.Meta.fields + ('matched', 'total')
 
 
 class UserWithRecipesSerializer(UserSerializer):
@@ -207,9 +427,12 @@ class UserWithRecipesSerializer(UserSerializer):
     class Meta:
         model = User
         fields = ('email', 'id', 'username', 'first_name', 'last_name',
-                  'is_subscribed', 'recipes', 'recipes_count', 'avatar')
+                  'is_subscribed', 'recipes', 'recipes_count', 'avatar',
+                  'avatar_renditions')
 
     def get_recipes(self, obj):
+        if hasattr(obj, 'limited_recipes'):
+            return RecipeMinSerializer(obj.limited_recipes, many=True).data
         request = self.context.get('request')
         limit = request.query_params.get('recipes_limit')
         recipes = obj.recipes.all()
@@ -221,6 +444,8 @@ class UserWithRecipesSerializer(UserSerializer):
         return RecipeMinSerializer(recipes, many=True).data
 
     def get_recipes_count(self, obj):
+        if hasattr(obj, 'recipes_count'):
+            return obj.recipes_count
         return obj.recipes.count()
 
 
@@ -243,7 +468,7 @@ class RecipeShortLinkSerializer(serializers.ModelSerializer):
         request = self.context.get('request')
         if not request:
             return None
-        return f"{request.scheme}://{request.get_host()}/s/{obj.slug[:3]}"
+        return f"{request.scheme}://{request.get_host()}/s/{obj.short_code}"
 
     def to_representation(self, instance):
         ret = super().to_representation(instance)
@@ -265,3 +490,61 @@ class SubscriptionSerializer(serializers.ModelSerializer):
                 'Вы уже подписаны на этого пользователя.'
             )
         return data
+
+
+class RecipeIdsSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=MAX_BULK_IDS
+    )
+
+
+class CanCookQuerySerializer(serializers.Serializer):
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=MAX_CAN_COOK_INGREDIENTS
+    )
+    limit = serializers.IntegerField(
+        min_value=1, max_value=MAX_CAN_COOK_LIMIT, default=10
+    )
+    complete = serializers.BooleanField(default=False)
+
+    def to_internal_value(self, data):
+        ingredients = [
+            value
+            for param in data.getlist('ingredients')
+            for value in param.split(',') if value
+        ]
+        data = {
+            key: data[key] for key in ('limit', 'complete') if key in data
+        }
+        return super().to_internal_value(
+            {**data, 'ingredients': ingredients}
+        )
+
+
+class ShoppingListExportSerializer(serializers.ModelSerializer):
+    expires_at = serializers.SerializerMethodField()
+    download = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ShoppingListExport
+        fields = ('id', 'status', 'created_at', 'finished_at', 'expires_at',
+                  'download', 'error')
+
+    def get_expires_at(self, obj):
+        expires_at = exports.expires_at(obj)
+        if expires_at is None:
+            return None
+        return serializers.DateTimeField().to_representation(expires_at)
+
+    def get_download(self, obj):
+        if obj.status != ShoppingListExport.DONE:
+            return None
+        return reverse(
+            'api:recipes-shopping-cart-export-file',
+            kwargs={'export_id': obj.pk},
+            request=self.context.get('request')
+        )
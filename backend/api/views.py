@@ -1,62 +1,76 @@
-from io import BytesIO
-
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db.models import Sum
-from django.http import FileResponse
+from django.db import transaction
+from django.db.models import (Count, Exists, F, OuterRef, Prefetch, Value,
+                              Window)
+from django.db.models.functions import RowNumber
+from django.http import FileResponse, HttpResponse
 from django.shortcuts import get_object_or_404, redirect
+from foodmanager import content_versions, counters, shopping_totals
+from foodmanager.catalogue import prefix_index
+from foodmanager.feed import keyset_sources, unfollow
 from foodmanager.models import (Ingredient, Recipe, Favorite,
-                                RecipeIngredient, Subscription, ShoppingCart)
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.pdfgen import canvas
-from rest_framework import filters, permissions, status, viewsets
+                                RecipeIngredient, Subscription, ShoppingCart,
+                                ShoppingListExport)
+from foodmanager.recipe_index import recipe_index
+from foodmanager.search import search_recipes
+from rest_framework import permissions, status, viewsets
 from rest_framework.decorators import action
-from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
 
+from . import exports
+from .caching import LRUCache
+from .catalogue import catalogue_response
+from .pagination import KeysetPagination, MergedKeysetPagination
+from .pdf import PDF_FILENAME, render_shopping_list
+from .response_cache import cached_response
 from .serializers import (IngredientSerializer, UserCreateSerializer,
                           UserSerializer, PasswordSerializer,
                           RecipeCreateUpdateSerializer, RecipeSerializer,
-                          RecipeMinSerializer, UserWithRecipesSerializer,
+                          FastRecipeSerializer,
+                          RecipeMinSerializer, RecipeIdsSerializer,
+                          CanCookQuerySerializer, CanCookRecipeSerializer,
+                          UserWithRecipesSerializer,
                           SetAvatarSerializer, RecipeShortLinkSerializer,
-                          SubscriptionSerializer)
+                          ShoppingListExportSerializer, SubscriptionSerializer)
 
 User = get_user_model()
 
-PDF_FONT = 'Arial'
-PDF_FONT_PATH = 'Arial.ttf'
-PDF_TITLE = 'Список покупок'
-PDF_FILENAME = 'shopping_list.pdf'
-PDF_TITLE_FONT_SIZE = 14
-PDF_TEXT_FONT_SIZE = 12
-PDF_START_Y = 750
-PDF_BOTTOM_MARGIN = 50
-PDF_LINE_HEIGHT = 25
-PDF_FIRST_PAGE_Y = 800
-PDF_PAGE_WIDTH, PDF_PAGE_HEIGHT = A4
+SHORT_LINK_CACHE_SIZE = 10000
+
+short_links = LRUCache(SHORT_LINK_CACHE_SIZE)
 
 
 class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     permission_classes = [permissions.AllowAny]
-    filter_backends = [filters.SearchFilter]
-    search_fields = ['^name']
     pagination_class = None
 
     def get_queryset(self):
-        queryset = Ingredient.objects.all()
-        name = self.request.query_params.get('name')
-
-        if name:
-            queryset = queryset.filter(name__istartswith=name)
-
-        return queryset.order_by('name')
-
+        return Ingredient.objects.order_by('name')
+
+    def list(self, request, *args, **kwargs):
+        """Без ``name`` отдаёт весь каталог, иначе — ингредиенты, название
+        которых начинается с ``name``. ``search`` — прежнее имя параметра.
+        """
+        name = (
+            request.query_params.get('name')
+            or request.query_params.get('search')
+        )
+        if not name:
+            if request.accepted_renderer.format == 'json':
+                return catalogue_response(request)
+            return super().list(request, *args, **kwargs)
 
-class LimitPageNumberPagination(PageNumberPagination):
-    page_size_query_param = 'limit'
+        limit = request.query_params.get('limit')
+        try:
+            limit = int(limit) if limit else None
+        except ValueError:
+            limit = None
+        if limit is not None and limit < 1:
+            limit = None
+        return Response(prefix_index().search(name, limit))
 
 
 class IsAuthorOrAdminOrReadOnly(permissions.BasePermission):
@@ -77,50 +91,75 @@ class IsAuthorOrAdminOrReadOnly(permissions.BasePermission):
         )
 
 
-def generate_shopping_cart_pdf(ingredients):
-    buffer = BytesIO()
-    pdf = canvas.Canvas(buffer, pagesize=A4)
-
-    pdfmetrics.registerFont(TTFont(PDF_FONT, PDF_FONT_PATH))
-    pdf.setFont(PDF_FONT, PDF_TITLE_FONT_SIZE)
-    pdf.drawString(30, PDF_FIRST_PAGE_Y, PDF_TITLE)
-
-    pdf.setFont(PDF_FONT, PDF_TEXT_FONT_SIZE)
-    y_position = PDF_START_Y
-
-    for i, item in enumerate(ingredients, 1):
-        line = (
-            f"{i}. {item['ingredient__name']} - "
-            f"{item['total']} {item['ingredient__measurement_unit']}"
-        )
-        pdf.drawString(30, y_position, line)
-        y_position -= PDF_LINE_HEIGHT
-
-        if y_position <= PDF_BOTTOM_MARGIN:
-            pdf.showPage()
-            pdf.setFont(PDF_FONT, PDF_TEXT_FONT_SIZE)
-            y_position = PDF_FIRST_PAGE_Y
-
-    pdf.showPage()
-    pdf.save()
-    buffer.seek(0)
-    return buffer
-
-
 class RecipeViewSet(viewsets.ModelViewSet):
     queryset = Recipe.objects.all()
-    pagination_class = LimitPageNumberPagination
+    pagination_class = KeysetPagination
     permission_classes = [IsAuthorOrAdminOrReadOnly]
+    popular_ordering = ('-favorites_count', '-id')
+
+    @property
+    def cursor_ordering(self):
+        if self.is_popular_ordering():
+            return self.popular_ordering
+        return KeysetPagination.cursor_ordering
+
+    def is_popular_ordering(self):
+        return (
+            self.action == 'list'
+            and self.request.query_params.get('ordering') == 'popular'
+        )
 
     def get_serializer_class(self):
         if self.action in ('create', 'partial_update', 'update'):
             return RecipeCreateUpdateSerializer
         if self.action == 'get_link':
             return RecipeShortLinkSerializer
+        return self.read_serializer_class()
+
+    def read_serializer_class(self):
+        if (
+            settings.FAST_RECIPE_SERIALIZER
+            and self.request.method in permissions.SAFE_METHODS
+        ):
+            return FastRecipeSerializer
         return RecipeSerializer
 
     def get_queryset(self):
         queryset = Recipe.objects.all()
+        if self.action not in ('list', 'retrieve', 'feed'):
+            return queryset
+
+        user = self.request.user
+        queryset = (
+            queryset
+            .defer('search_vector')
+            .select_related('author')
+            .prefetch_related(Prefetch(
+                'recipe_ingredients',
+                queryset=RecipeIngredient.objects.select_related('ingredient')
+            ))
+        )
+
+        if user.is_authenticated:
+            queryset = queryset.annotate(
+                is_favorited=Exists(Favorite.objects.filter(
+                    user=user, recipe=OuterRef('pk')
+                )),
+                is_in_shopping_cart=Exists(ShoppingCart.objects.filter(
+                    user=user, recipe=OuterRef('pk')
+                )),
+                author_is_subscribed=Exists(Subscription.objects.filter(
+                    user=user, author=OuterRef('author')
+                )),
+            )
+        else:
+            queryset = queryset.annotate(
+                is_favorited=Value(False),
+                is_in_shopping_cart=Value(False),
+                author_is_subscribed=Value(False),
+            )
+        if self.action == 'feed':
+            return queryset
 
         author = self.request.query_params.get('author')
         if author:
@@ -141,8 +180,32 @@ class RecipeViewSet(viewsets.ModelViewSet):
                     in_shopping_cart__user=self.request.user
                 )
 
+        text = self.request.query_params.get('search')
+        if text and self.action == 'list':
+            queryset = search_recipes(queryset, text)
+        if self.is_popular_ordering():
+            queryset = queryset.order_by(*self.popular_ordering)
+
         return queryset
 
+    def list(self, request, *args, **kwargs):
+        render = super().list
+        if self.is_popular_ordering():
+            return render(request, *args, **kwargs)
+        return cached_response(
+            request,
+            content_versions.list_versions,
+            lambda: render(request, *args, **kwargs)
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        render = super().retrieve
+        return cached_response(
+            request,
+            lambda: content_versions.recipe_versions(kwargs['pk']),
+            lambda: render(request, *args, **kwargs)
+        )
+
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
@@ -160,6 +223,52 @@ class RecipeViewSet(viewsets.ModelViewSet):
         )
         return Response(serializer.data)
 
+    @action(
+        detail=False,
+        methods=['get'],
+        permission_classes=[permissions.IsAuthenticated],
+        pagination_class=MergedKeysetPagination
+    )
+    def feed(self, request):
+        recipes = self.paginate_queryset(self.get_queryset())
+        serializer = self.read_serializer_class()(
+            recipes, many=True, context={'request': request}
+        )
+        return self.get_paginated_response(serializer.data)
+
+    def get_keyset_sources(self):
+        return keyset_sources(self.request.user.id)
+
+    @action(
+        detail=False,
+        methods=['get'],
+        permission_classes=[permissions.AllowAny],
+        url_path='can-cook',
+        url_name='can-cook'
+    )
+    def can_cook(self, request):
+        query = CanCookQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        ranked = recipe_index().cookable(
+            query.validated_data['ingredients'],
+            query.validated_data['limit'],
+            complete=query.validated_data['complete']
+        )
+        recipes = Recipe.objects.only(
+            'id', 'name', 'image', 'image_renditions', 'cooking_time'
+        ).in_bulk([recipe_id for recipe_id, _, _ in ranked])
+        results = []
+        for recipe_id, matched, total in ranked:
+            recipe = recipes.get(recipe_id)
+            if recipe is None:
+                continue
+            recipe.matched, recipe.total = matched, total
+            results.append(recipe)
+        serializer = CanCookRecipeSerializer(
+            results, many=True, context={'request': request}
+        )
+        return Response(serializer.data)
+
     @action(
         detail=True,
         methods=['post', 'delete'],
@@ -169,9 +278,12 @@ class RecipeViewSet(viewsets.ModelViewSet):
         recipe = self.get_object()
 
         if request.method == 'POST':
-            favorite, created = Favorite.objects.get_or_create(
-                user=request.user, recipe=recipe
-            )
+            with transaction.atomic():
+                favorite, created = Favorite.objects.get_or_create(
+                    user=request.user, recipe=recipe
+                )
+                if created:
+                    counters.change(Favorite, [recipe.id], 1)
 
             if not created:
                 return Response(
@@ -183,7 +295,12 @@ class RecipeViewSet(viewsets.ModelViewSet):
             return Response(serializer.data, status=status.HTTP_201_CREATED)
 
         if request.method == 'DELETE':
-            deleted, _ = request.user.favorites.filter(recipe=recipe).delete()
+            with transaction.atomic():
+                deleted, _ = request.user.favorites.filter(
+                    recipe=recipe
+                ).delete()
+                if deleted:
+                    counters.change(Favorite, [recipe.id], -1)
 
             if not deleted:
                 return Response(
@@ -204,9 +321,13 @@ class RecipeViewSet(viewsets.ModelViewSet):
         recipe = self.get_object()
 
         if request.method == 'POST':
-            cart_item, created = ShoppingCart.objects.get_or_create(
-                user=request.user, recipe=recipe
-            )
+            with transaction.atomic():
+                cart_item, created = ShoppingCart.objects.get_or_create(
+                    user=request.user, recipe=recipe
+                )
+                if created:
+                    shopping_totals.add_recipes(request.user.id, [recipe.id])
+                    counters.change(ShoppingCart, [recipe.id], 1)
 
             if not created:
                 return Response(
@@ -218,7 +339,15 @@ class RecipeViewSet(viewsets.ModelViewSet):
             return Response(serializer.data, status=status.HTTP_201_CREATED)
 
         if request.method == 'DELETE':
-            deleted, _ = request.user.shopping_cart.filter(recipe=recipe).delete()
+            with transaction.atomic():
+                deleted, _ = request.user.shopping_cart.filter(
+                    recipe=recipe
+                ).delete()
+                if deleted:
+                    shopping_totals.remove_recipes(
+                        request.user.id, [recipe.id]
+                    )
+                    counters.change(ShoppingCart, [recipe.id], -1)
 
             if not deleted:
                 return Response(
@@ -230,6 +359,77 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
         return Response(status=status.HTTP_405_METHOD_NOT_ALLOWED)
 
+    def bulk_relation(self, request, model, on_added=None, on_removed=None):
+        """Добавляет или убирает связи пользователя с рецептами ``ids``
+        одной вставкой или одним удалением и сообщает, какие id
+        обработаны, пропущены или не найдены.
+        """
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = list(dict.fromkeys(serializer.validated_data['ids']))
+        user = request.user
+
+        with transaction.atomic():
+            list(
+                User.objects.select_for_update()
+                .filter(pk=user.pk).values_list('pk', flat=True)
+            )
+            found = set(
+                Recipe.objects.filter(pk__in=ids)
+                .values_list('pk', flat=True).order_by()
+            )
+            linked = set(
+                model.objects.filter(user=user, recipe_id__in=found)
+                .values_list('recipe_id', flat=True).order_by()
+            )
+            new = [pk for pk in ids if pk in found and pk not in linked]
+            old = [pk for pk in ids if pk in linked]
+            if request.method == 'POST':
+                model.objects.bulk_create(
+                    (model(user=user, recipe_id=pk) for pk in new),
+                    ignore_conflicts=True
+                )
+                report = {'added': new, 'skipped': old}
+                if new:
+                    counters.change(model, new, 1)
+                if new and on_added:
+                    on_added(user.id, new)
+            else:
+                model.objects.filter(user=user, recipe_id__in=old).delete()
+                report = {'removed': old, 'skipped': new}
+                if old:
+                    counters.change(model, old, -1)
+                if old and on_removed:
+                    on_removed(user.id, old)
+
+        report['missing'] = [pk for pk in ids if pk not in found]
+        return Response(report)
+
+    @action(
+        detail=False,
+        methods=['post', 'delete'],
+        permission_classes=[permissions.IsAuthenticated],
+        url_path='favorite/bulk',
+        url_name='favorite-bulk'
+    )
+    def favorite_bulk(self, request):
+        return self.bulk_relation(request, Favorite)
+
+    @action(
+        detail=False,
+        methods=['post', 'delete'],
+        permission_classes=[permissions.IsAuthenticated],
+        url_path='shopping_cart/bulk',
+        url_name='shopping-cart-bulk'
+    )
+    def shopping_cart_bulk(self, request):
+        return self.bulk_relation(
+            request,
+            ShoppingCart,
+            on_added=shopping_totals.add_recipes,
+            on_removed=shopping_totals.remove_recipes
+        )
+
     @action(
         detail=False,
         methods=['get'],
@@ -243,19 +443,66 @@ class RecipeViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        recipes = Recipe.objects.filter(in_shopping_cart__user=user)
+        ingredients = shopping_totals.shopping_list(user.id)
+        response = HttpResponse(content_type='application/pdf')
+        response['Content-Disposition'] = (
+            f'attachment; filename="{PDF_FILENAME}"'
+        )
+        return render_shopping_list(ingredients, response)
 
-        ingredients = (
-            RecipeIngredient.objects
-            .filter(recipe__in=recipes)
-            .values('ingredient__name', 'ingredient__measurement_unit')
-            .annotate(total=Sum('amount'))
+    @action(
+        detail=False,
+        methods=['post'],
+        permission_classes=[permissions.IsAuthenticated],
+        url_path='download_shopping_cart/export',
+        url_name='shopping-cart-export'
+    )
+    def shopping_cart_export(self, request):
+        if not request.user.shopping_cart.exists():
+            return Response(
+                {'errors': 'Ваш список покупок пуст.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        export, created = exports.enqueue(request.user)
+        serializer = ShoppingListExportSerializer(
+            export, context={'request': request}
+        )
+        return Response(
+            serializer.data,
+            status=status.HTTP_202_ACCEPTED if created else status.HTTP_200_OK
         )
 
-        buffer = generate_shopping_cart_pdf(ingredients)
+    @action(
+        detail=False,
+        methods=['get'],
+        permission_classes=[permissions.IsAuthenticated],
+        url_path=r'download_shopping_cart/export/(?P<export_id>\d+)',
+        url_name='shopping-cart-export-detail'
+    )
+    def shopping_cart_export_detail(self, request, export_id=None):
+        export = get_object_or_404(
+            request.user.shopping_list_exports, pk=export_id
+        )
+        serializer = ShoppingListExportSerializer(
+            export, context={'request': request}
+        )
+        return Response(serializer.data)
 
+    @action(
+        detail=False,
+        methods=['get'],
+        permission_classes=[permissions.IsAuthenticated],
+        url_path=r'download_shopping_cart/export/(?P<export_id>\d+)/file',
+        url_name='shopping-cart-export-file'
+    )
+    def shopping_cart_export_file(self, request, export_id=None):
+        export = get_object_or_404(
+            request.user.shopping_list_exports,
+            pk=export_id,
+            status=ShoppingListExport.DONE
+        )
         return FileResponse(
-            buffer,
+            export.file.open('rb'),
             as_attachment=True,
             filename=PDF_FILENAME,
             content_type='application/pdf'
@@ -263,20 +510,72 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
 
 def recipe_short_link(request, slug_short):
-    recipe = get_object_or_404(Recipe, slug__startswith=slug_short)
-    return redirect('api:recipes-detail', pk=recipe.id)
+    recipe_id = short_links.get(slug_short)
+    if recipe_id is None:
+        recipe_id = get_object_or_404(
+            Recipe.objects.values_list('id', flat=True),
+            short_code=slug_short
+        )
+        short_links.set(slug_short, recipe_id)
+    return redirect('api:recipes-detail', pk=recipe_id)
 
 
 class UserViewSet(viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
-    pagination_class = LimitPageNumberPagination
+    pagination_class = KeysetPagination
+    cursor_ordering = ('username', 'id')
 
     def get_serializer_class(self):
         if self.action == 'create':
             return UserCreateSerializer
         return UserSerializer
 
+    def get_queryset(self):
+        queryset = User.objects.all()
+        user = self.request.user
+        if self.action in ('list', 'retrieve') and user.is_authenticated:
+            queryset = queryset.annotate(
+                is_subscribed=Exists(Subscription.objects.filter(
+                    user=user, author=OuterRef('pk')
+                ))
+            )
+        return queryset
+
+    def subscribed_authors(self, request):
+        recipes = Recipe.objects.only(
+            'id', 'author_id', 'name', 'image', 'image_renditions',
+            'cooking_time', 'created_at'
+        )
+        limit = request.query_params.get('recipes_limit')
+        try:
+            limit = int(limit) if limit else None
+        except ValueError:
+            limit = None
+        if limit is not None:
+            recipes = recipes.annotate(
+                author_position=Window(
+                    RowNumber(),
+                    partition_by=F('author_id'),
+                    order_by=(F('created_at').desc(), F('id').desc())
+                )
+            ).filter(author_position__lte=limit)
+
+        return (
+            User.objects
+            .filter(subscribers__user=request.user)
+            .annotate(
+                recipes_count=Count('recipes'),
+                is_subscribed=Value(True)
+            )
+            .order_by('username')
+            .prefetch_related(
+                Prefetch(
+                    'recipes', queryset=recipes, to_attr='limited_recipes'
+                )
+            )
+        )
+
     def get_permissions(self):
         if self.action == 'create' or self.action == 'retrieve' or self.action == 'list':
             return [permissions.AllowAny()]
@@ -344,7 +643,7 @@ class UserViewSet(viewsets.ModelViewSet):
         permission_classes=[permissions.IsAuthenticated]
     )
     def subscriptions(self, request):
-        authors = User.objects.filter(subscribers__user=request.user)
+        authors = self.subscribed_authors(request)
         paginated_queryset = self.paginate_queryset(authors)
         serializer = UserWithRecipesSerializer(
             paginated_queryset,
@@ -369,13 +668,14 @@ class UserViewSet(viewsets.ModelViewSet):
             Subscription.objects.create(user=request.user, author=author)
 
             response_serializer = UserWithRecipesSerializer(
-                author,
+                self.subscribed_authors(request).get(pk=author.pk),
                 context={'request': request}
             )
             return Response(response_serializer.data, status=status.HTTP_201_CREATED)
 
         if request.method == 'DELETE':
             deleted, _ = request.user.subscriptions.filter(author=author).delete()
+            unfollow(request.user.id, author.id)
 
             if not deleted:
                 return Response(
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 import os
+import tempfile
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -87,6 +88,42 @@ DATABASES = {
     }
 }
 
+# Cache
+# Versions of cached data (ingredient catalogue, etc.) are kept here, so
+# deployments with several worker processes need a shared backend.
+
+CACHES = {
+    'default': {
+        "BACKEND": os.getenv(
+            "CACHE_BACKEND",
+            default="django.core.cache.backends.filebased.FileBasedCache"
+        ),
+        "LOCATION": os.getenv(
+            "CACHE_LOCATION",
+            default=os.path.join(tempfile.gettempdir(), "foodgram-cache")
+        ),
+    },
+    'responses': {
+        "BACKEND": os.getenv(
+            "RESPONSE_CACHE_BACKEND",
+            default="django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.getenv("RESPONSE_CACHE_LOCATION", default="responses"),
+        "TIMEOUT": None,
+        "OPTIONS": {
+            "MAX_ENTRIES": int(
+                os.getenv("RESPONSE_CACHE_MAX_ENTRIES", default=5000)
+            ),
+        },
+    },
+}
+
+RESPONSE_CACHE_ALIAS = os.getenv("RESPONSE_CACHE_ALIAS", default="")
+
+FAST_RECIPE_SERIALIZER = bool(
+    int(os.getenv("FAST_RECIPE_SERIALIZER", default=0))
+)
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -125,6 +162,11 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Image renditions
+IMAGE_RENDITION_WORKERS = int(
+    os.getenv("IMAGE_RENDITION_WORKERS", default=2)
+)
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -145,6 +187,41 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 6,
 }
 
+# Shopping list exports
+SHOPPING_LIST_EXPORT_WORKERS = int(
+    os.getenv("SHOPPING_LIST_EXPORT_WORKERS", default=2)
+)
+SHOPPING_LIST_EXPORT_TTL = int(
+    os.getenv("SHOPPING_LIST_EXPORT_TTL", default=3600)
+)
+SHOPPING_LIST_EXPORT_TIMEOUT = int(
+    os.getenv("SHOPPING_LIST_EXPORT_TIMEOUT", default=300)
+)
+
+# Subscription feed
+FEED_FANOUT_MAX_FOLLOWERS = int(
+    os.getenv("FEED_FANOUT_MAX_FOLLOWERS", default=10000)
+)
+FEED_FANOUT_BATCH_SIZE = int(
+    os.getenv("FEED_FANOUT_BATCH_SIZE", default=1000)
+)
+FEED_BACKFILL_RECIPES = int(
+    os.getenv("FEED_BACKFILL_RECIPES", default=100)
+)
+
+# "What can I cook" index
+RECIPE_INDEX_BACKGROUND_REBUILD = bool(
+    int(os.getenv("RECIPE_INDEX_BACKGROUND_REBUILD", default=1))
+)
+
+# Pagination counts
+PAGINATION_COUNT_CACHE_TIMEOUT = int(
+    os.getenv("PAGINATION_COUNT_CACHE_TIMEOUT", default=30)
+)
+PAGINATION_COUNT_ESTIMATE_THRESHOLD = int(
+    os.getenv("PAGINATION_COUNT_ESTIMATE_THRESHOLD", default=100000)
+)
+
 # CORS settings
 CORS_ORIGIN_ALLOW_ALL = True
 CORS_URLS_REGEX = r'^/api/.*$'
@@ -6,3 +6,9 @@ class FoodManagerConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'foodmanager'
     verbose_name = _('Управление рецептами')
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .utils import require_shared_cache
+
+        require_shared_cache()
@@ -0,0 +1,84 @@
+from bisect import bisect_left
+from heapq import nsmallest
+from threading import Lock
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Ingredient
+
+VERSION_KEY = 'ingredient-catalogue-version'
+PREFIX_END = chr(0x10ffff)
+
+
+def catalogue_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, uuid4().hex, timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def bump_catalogue_version():
+    """Помечает каталог устаревшим после фиксации текущей транзакции,
+    чтобы параллельная пересборка не прочитала ещё не зафиксированные
+    строки под новой версией.
+    """
+    transaction.on_commit(
+        lambda: cache.set(VERSION_KEY, uuid4().hex, timeout=None)
+    )
+
+
+def fold(text):
+    return text.casefold()
+
+
+class IngredientPrefixIndex:
+    """Отсортированный массив названий ингредиентов в нижнем регистре.
+
+    ``rows`` — сериализованные ингредиенты в порядке выдачи API; поиск по
+    префиксу находит диапазон через bisect и возвращает строки в этом же
+    порядке.
+    """
+
+    def __init__(self, rows, version=None):
+        self.rows = rows
+        self.version = version
+        entries = sorted(
+            (fold(row['name']), position)
+            for position, row in enumerate(rows)
+        )
+        self.keys = [key for key, _ in entries]
+        self.positions = [position for _, position in entries]
+
+    def search(self, prefix, limit=None):
+        prefix = fold(prefix)
+        start = bisect_left(self.keys, prefix)
+        end = bisect_left(self.keys, prefix + PREFIX_END, start)
+        positions = self.positions[start:end]
+        if limit is None:
+            positions.sort()
+        else:
+            positions = nsmallest(limit, positions)
+        return [self.rows[position] for position in positions]
+
+
+index_lock = Lock()
+current_index = None
+
+
+def prefix_index():
+    global current_index
+    version = catalogue_version()
+    index = current_index
+    if index is not None and index.version == version:
+        return index
+    with index_lock:
+        if current_index is None or current_index.version != version:
+            rows = list(
+                Ingredient.objects.order_by('name')
+                .values('id', 'name', 'measurement_unit')
+            )
+            current_index = IngredientPrefixIndex(rows, version)
+        return current_index
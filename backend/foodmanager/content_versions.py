@@ -0,0 +1,89 @@
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Recipe
+
+PREFIX = 'recipe-content-version'
+LIST_KEY = f'{PREFIX}:list'
+SHARED_KEY = f'{PREFIX}:shared'
+
+
+def recipe_key(recipe_id):
+    return f'{PREFIX}:recipe:{recipe_id}'
+
+
+def versions(*keys):
+    found = cache.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    if missing:
+        for key in missing:
+            cache.add(key, uuid4().hex, timeout=None)
+        found.update(cache.get_many(missing))
+    return [found[key] for key in keys]
+
+
+def list_versions():
+    """Версии, от которых зависит любой список рецептов."""
+    return versions(LIST_KEY, SHARED_KEY)
+
+
+def recipe_versions(recipe_id):
+    """Версии, от которых зависит карточка рецепта ``recipe_id``, или
+    ``None``, если такого рецепта нет.
+
+    Ключ версии создаётся только для существующего рецепта, иначе
+    запросы к несуществующим id заполняли бы кэш вечными ключами.
+    """
+    try:
+        recipe_id = int(recipe_id)
+    except (TypeError, ValueError):
+        return None
+    keys = (recipe_key(recipe_id), SHARED_KEY)
+    found = cache.get_many(keys)
+    if len(found) == len(keys):
+        return [found[key] for key in keys]
+    if keys[0] not in found and (
+        not Recipe.objects.filter(pk=recipe_id).exists()
+    ):
+        return None
+    return versions(*keys)
+
+
+def bump(*keys):
+    """Меняет версии ``keys`` после фиксации текущей транзакции."""
+    transaction.on_commit(
+        lambda: cache.set_many(
+            {key: uuid4().hex for key in keys}, timeout=None
+        )
+    )
+
+
+def bump_recipes(recipe_ids):
+    bump(LIST_KEY, *map(recipe_key, recipe_ids))
+
+
+def forget_recipe(recipe_id):
+    """Удаляет версию удалённого рецепта после фиксации транзакции."""
+    bump(LIST_KEY)
+    transaction.on_commit(lambda: cache.delete(recipe_key(recipe_id)))
+
+
+def bump_author(author_id):
+    bump_recipes(
+        Recipe.objects.filter(author_id=author_id)
+        .values_list('pk', flat=True)
+        .order_by()
+    )
+
+
+def bump_shared():
+    bump(SHARED_KEY)
+
+
+def bump_object(model_label, pk):
+    if model_label == Recipe._meta.label_lower:
+        bump_recipes([pk])
+    else:
+        bump_author(pk)
@@ -0,0 +1,91 @@
+from collections import Counter, defaultdict
+
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Favorite, Recipe, ShoppingCart
+
+COUNTER_FIELDS = {
+    Favorite: 'favorites_count',
+    ShoppingCart: 'in_carts_count',
+}
+BATCH_SIZE = 1000
+
+
+def change(model, recipe_ids, delta):
+    """Сдвигает счётчик связей ``model`` у рецептов ``recipe_ids``
+    на ``delta`` одним UPDATE без чтения текущих значений.
+    """
+    field = COUNTER_FIELDS[model]
+    value = F(field) + delta
+    if delta < 0:
+        value = Greatest(value, 0)
+    return Recipe.objects.filter(pk__in=recipe_ids).update(**{field: value})
+
+
+def remove_links(model, recipe_ids):
+    """Вычитает по одной связи ``model`` за каждое вхождение рецепта в
+    ``recipe_ids``. Рецепты с одинаковым числом вхождений сдвигаются
+    одним UPDATE.
+    """
+    groups = defaultdict(list)
+    for recipe_id, links in Counter(recipe_ids).items():
+        groups[links].append(recipe_id)
+    for links, grouped_ids in groups.items():
+        change(model, grouped_ids, -links)
+
+
+def remove_user(user_id):
+    """Вычитает связи пользователя, которые удалит каскад."""
+    for model in COUNTER_FIELDS:
+        change(
+            model,
+            model.objects.filter(user_id=user_id).values('recipe_id'),
+            -1
+        )
+
+
+def actual_count(model):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(recipe=OuterRef('pk'))
+            .order_by()
+            .values('recipe')
+            .annotate(total=Count('pk'))
+            .values('total')
+        ),
+        0
+    )
+
+
+def reconcile(fix=True):
+    """Сверяет счётчики рецептов с таблицами связей и, если ``fix``,
+    исправляет расхождения. Возвращает число расходящихся рецептов.
+    """
+    annotations = {
+        f'actual_{field}': actual_count(model)
+        for model, field in COUNTER_FIELDS.items()
+    }
+    drift = Q()
+    for field in COUNTER_FIELDS.values():
+        drift |= ~Q(**{field: F(f'actual_{field}')})
+    recipes = (
+        Recipe.objects
+        .annotate(**annotations)
+        .filter(drift)
+        .only('pk', *COUNTER_FIELDS.values())
+        .order_by('pk')
+    )
+    drifted = 0
+    batch = []
+    for recipe in recipes.iterator(chunk_size=BATCH_SIZE):
+        for field in COUNTER_FIELDS.values():
+            setattr(recipe, field, getattr(recipe, f'actual_{field}'))
+        batch.append(recipe)
+        drifted += 1
+        if fix and len(batch) == BATCH_SIZE:
+            Recipe.objects.bulk_update(batch, COUNTER_FIELDS.values())
+            batch = []
+    if fix and batch:
+        Recipe.objects.bulk_update(batch, COUNTER_FIELDS.values())
+    return drifted
@@ -0,0 +1,126 @@
+from django.conf import settings
+from django.db import transaction
+
+from .models import FeedEntry, Recipe, Subscription
+
+
+def follower_ids(author_id):
+    return (
+        Subscription.objects.filter(author_id=author_id)
+        .values_list('user_id', flat=True)
+        .order_by('user_id')
+    )
+
+
+def recent_recipes(author_id):
+    """Последние рецепты автора, которые рассылаются по лентам."""
+    return list(
+        Recipe.objects.filter(author_id=author_id, in_timelines=True)
+        .order_by('-created_at', '-id')
+        .values_list('pk', 'created_at')[:settings.FEED_BACKFILL_RECIPES]
+    )
+
+
+def add_entries(user_ids, author_id, recipes):
+    """Добавляет рецепты ``recipes`` (пары id и даты создания) в ленты
+    пользователей ``user_ids`` пачками по ``FEED_FANOUT_BATCH_SIZE``.
+    """
+    batch_size = settings.FEED_FANOUT_BATCH_SIZE
+    batch = []
+    added = 0
+    for user_id in user_ids:
+        for recipe_id, created_at in recipes:
+            batch.append(FeedEntry(
+                user_id=user_id,
+                recipe_id=recipe_id,
+                author_id=author_id,
+                created_at=created_at
+            ))
+        if len(batch) >= batch_size:
+            FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+            added += len(batch)
+            batch = []
+    FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+    return added + len(batch)
+
+
+def fan_out(recipe_id):
+    recipe = Recipe.objects.filter(
+        pk=recipe_id, in_timelines=True
+    ).values_list('author_id', 'created_at').first()
+    if recipe is None:
+        return 0
+    author_id, created_at = recipe
+    return add_entries(
+        follower_ids(author_id).iterator(
+            chunk_size=settings.FEED_FANOUT_BATCH_SIZE
+        ),
+        author_id,
+        [(recipe_id, created_at)]
+    )
+
+
+def publish(recipe):
+    """Рассылает новый рецепт по лентам подписчиков после фиксации
+    транзакции.
+
+    Рецепты авторов, у которых больше ``FEED_FANOUT_MAX_FOLLOWERS``
+    подписчиков, не рассылаются: лента читает их из таблицы рецептов.
+    """
+    followers = follower_ids(recipe.author_id).count()
+    if followers > settings.FEED_FANOUT_MAX_FOLLOWERS:
+        Recipe.objects.filter(pk=recipe.pk).update(in_timelines=False)
+        recipe.in_timelines = False
+    elif followers:
+        transaction.on_commit(lambda: fan_out(recipe.pk), robust=True)
+
+
+def follow(user_id, author_id):
+    """Переносит в ленту нового подписчика последние рецепты автора."""
+    return add_entries([user_id], author_id, recent_recipes(author_id))
+
+
+def unfollow(user_id, author_id):
+    FeedEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def keyset_sources(user_id):
+    """Выборки ключей ленты пользователя для
+    :class:`api.pagination.MergedKeysetPagination`: разосланные записи и
+    рецепты авторов, которые читаются при запросе.
+    """
+    return (
+        (
+            FeedEntry.objects.filter(user_id=user_id),
+            ('created_at', 'recipe_id')
+        ),
+        (
+            Recipe.objects.filter(
+                in_timelines=False,
+                author_id__in=Subscription.objects.filter(
+                    user_id=user_id
+                ).values('author_id')
+            ),
+            ('created_at', 'id')
+        ),
+    )
+
+
+def rebuild(author_id):
+    """Заново строит записи лент для рецептов автора и выбирает способ
+    доставки его рецептов по текущему числу подписчиков.
+    """
+    followers = follower_ids(author_id)
+    push = followers.count() <= settings.FEED_FANOUT_MAX_FOLLOWERS
+    with transaction.atomic():
+        FeedEntry.objects.filter(author_id=author_id).delete()
+        Recipe.objects.filter(author_id=author_id).exclude(
+            in_timelines=push
+        ).update(in_timelines=push)
+        if not push:
+            return 0
+        return add_entries(
+            followers.iterator(chunk_size=settings.FEED_FANOUT_BATCH_SIZE),
+            author_id,
+            recent_recipes(author_id)
+        )
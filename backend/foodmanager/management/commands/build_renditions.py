@@ -0,0 +1,77 @@
+from concurrent.futures import as_completed
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from foodmanager import renditions
+from foodmanager.models import Recipe, User
+
+
+class Command(BaseCommand):
+    help = (
+        'Строит уменьшенные копии изображений рецептов и аватаров, '
+        'для которых их ещё нет или которые устарели.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Перестроить копии для всех изображений.'
+        )
+        parser.add_argument(
+            '--model', choices=('recipe', 'user'), action='append',
+            help='Обработать только указанные модели.'
+        )
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        models = {'recipe': Recipe, 'user': User}
+        failed = 0
+        for name in options['model'] or models:
+            model = models[name]
+            field, renditions_field = renditions.RENDITION_FIELDS[
+                model._meta.label_lower
+            ]
+            rows = (
+                model.objects.exclude(**{field: ''})
+                .exclude(**{f'{field}__isnull': True})
+                .values_list('pk', field, renditions_field)
+                .order_by('pk')
+            )
+            pks = [
+                pk for pk, source, built in rows.iterator(chunk_size=2000)
+                if options['force'] or (built or {}).get('source') != source
+            ]
+            failed += self.build(model, pks)
+        if failed:
+            self.stderr.write(f'Не удалось обработать: {failed}')
+
+    def build(self, model, pks):
+        label = model._meta.label_lower
+        total = len(pks)
+        failed = 0
+        for done, (pk, error) in enumerate(self.run(label, pks), start=1):
+            if error is not None:
+                failed += 1
+                self.stderr.write(f'{label} {pk}: {error!r}')
+            if self.verbosity and (done % 100 == 0 or done == total):
+                self.stdout.write(
+                    f'{model._meta.verbose_name_plural}: {done}/{total}'
+                )
+        return failed
+
+    def run(self, label, pks):
+        if not settings.IMAGE_RENDITION_WORKERS:
+            for pk in pks:
+                try:
+                    renditions.build(label, pk)
+                except Exception as error:
+                    yield pk, error
+                else:
+                    yield pk, None
+            return
+        executor = renditions.executor()
+        futures = {
+            executor.submit(renditions.build, label, pk): pk for pk in pks
+        }
+        for future in as_completed(futures):
+            yield futures[future], future.exception()
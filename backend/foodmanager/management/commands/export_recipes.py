@@ -0,0 +1,83 @@
+import sys
+
+from django.core.management.base import BaseCommand
+from django.db.models import Exists, OuterRef, Prefetch
+from foodmanager import transfer
+from foodmanager.models import Recipe, RecipeIngredient, User
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает рецепты с ингредиентами и авторами в NDJSON, по '
+        'желанию вместе с избранным, списками покупок и подписками.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', help='Файл NDJSON или "-" для вывода в stdout.'
+        )
+        parser.add_argument(
+            '--relations', action='store_true',
+            help='Выгрузить избранное, списки покупок и подписки.'
+        )
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        self.chunk_size = options['chunk_size']
+        self.verbosity = options['verbosity']
+        if options['path'] == '-':
+            self.export(sys.stdout, options['relations'])
+            return
+        with open(options['path'], 'w', encoding='utf-8') as file:
+            self.export(file, options['relations'])
+
+    def export(self, file, relations):
+        users = User.objects.only(*transfer.USER_FIELDS).order_by('pk')
+        if not relations:
+            users = users.filter(
+                Exists(Recipe.objects.filter(author=OuterRef('pk')))
+            )
+        self.write(file, 'Пользователи', (
+            transfer.user_record(user) for user in self.iterate(users)
+        ))
+
+        recipes = (
+            Recipe.objects
+            .only('author_id', 'created_at', *transfer.RECIPE_FIELDS)
+            .prefetch_related(Prefetch(
+                'recipe_ingredients',
+                queryset=RecipeIngredient.objects.select_related(
+                    'ingredient'
+                ).order_by('pk')
+            ))
+            .order_by('pk')
+        )
+        self.write(file, 'Рецепты', (
+            transfer.recipe_record(recipe)
+            for recipe in self.iterate(recipes)
+        ))
+
+        if not relations:
+            return
+        for record_type, (model, target) in transfer.RELATION_TYPES.items():
+            pairs = model.objects.values_list('user_id', target).order_by(
+                'pk'
+            )
+            self.write(file, model._meta.verbose_name_plural, (
+                transfer.relation_record(record_type, user_id, target_id)
+                for user_id, target_id in self.iterate(pairs)
+            ))
+
+    def iterate(self, queryset):
+        return queryset.iterator(chunk_size=self.chunk_size)
+
+    def write(self, file, label, records):
+        written = 0
+        for record in records:
+            file.write(transfer.dump(record))
+            file.write('\n')
+            written += 1
+            if self.verbosity > 1 and written % self.chunk_size == 0:
+                self.stderr.write(f'{label}: {written}')
+        if self.verbosity:
+            self.stderr.write(f'{label}: {written}')
@@ -0,0 +1,201 @@
+import json
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils.dateparse import parse_datetime
+from foodmanager import (content_versions, counters, feed, shopping_totals,
+                         transfer)
+from foodmanager.models import (Ingredient, Recipe, RecipeIngredient,
+                                ShoppingCart, User)
+from foodmanager.recipe_index import bump_recipe_index_version
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает рецепты из NDJSON, выгруженного export_recipes. '
+        'Пользователи сопоставляются по email, ингредиенты по названию и '
+        'единице измерения, остальные id назначаются заново.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл NDJSON.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if not connection.features.can_return_rows_from_bulk_insert:
+            raise CommandError(
+                'База данных не возвращает id из bulk_create.'
+            )
+        self.verbosity = options['verbosity']
+        self.batch_size = options['batch_size']
+        self.user_ids = {}
+        self.recipe_ids = {}
+        self.ingredient_ids = {
+            (name, unit): pk for pk, name, unit in
+            Ingredient.objects.values_list(
+                'pk', 'name', 'measurement_unit'
+            ).order_by().iterator(chunk_size=self.batch_size)
+        }
+        self.authors = set()
+        self.cart_users = set()
+        self.counts = defaultdict(int)
+
+        batch_type, batch = None, []
+        with open(options['path'], encoding='utf-8') as file:
+            for number, line in enumerate(file, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                    record_type = record['type']
+                except (ValueError, KeyError, TypeError):
+                    raise CommandError(f'Строка {number}: неверная запись.')
+                if record_type != batch_type or len(batch) == self.batch_size:
+                    self.flush(batch_type, batch)
+                    batch_type, batch = record_type, []
+                batch.append(record)
+        self.flush(batch_type, batch)
+        self.finish()
+
+    def flush(self, record_type, records):
+        if not records:
+            return
+        loader = {
+            'user': self.load_users,
+            'recipe': self.load_recipes,
+        }.get(record_type)
+        if loader is None and record_type in transfer.RELATION_TYPES:
+            loader = self.load_relations
+        if loader is None:
+            raise CommandError(f'Неизвестный тип записи: {record_type}')
+        with transaction.atomic():
+            loader(record_type, records)
+        self.counts[record_type] += len(records)
+        if self.verbosity > 1:
+            self.stdout.write(f'{record_type}: {self.counts[record_type]}')
+
+    def load_users(self, record_type, records):
+        existing = dict(
+            User.objects.filter(
+                email__in=[record['email'] for record in records]
+            ).values_list('email', 'pk')
+        )
+        taken = set(
+            User.objects.filter(
+                username__in=[record['username'] for record in records]
+            ).values_list('username', flat=True)
+        )
+        new = []
+        for record in records:
+            if record['email'] in existing:
+                self.user_ids[record['id']] = existing[record['email']]
+            elif record['username'] in taken:
+                self.counts['skipped_users'] += 1
+            else:
+                taken.add(record['username'])
+                new.append((record['id'], User(**{
+                    field: record[field] for field in transfer.USER_FIELDS
+                })))
+        User.objects.bulk_create(user for _, user in new)
+        self.user_ids.update((old_id, user.pk) for old_id, user in new)
+
+    def load_recipes(self, record_type, records):
+        known = [
+            record for record in records if record['author'] in self.user_ids
+        ]
+        self.counts['skipped_recipes'] += len(records) - len(known)
+        records = known
+        self.create_ingredients(records)
+        recipes = Recipe.objects.bulk_create(
+            Recipe(
+                author_id=self.user_ids[record['author']],
+                **{field: record[field] for field in transfer.RECIPE_FIELDS}
+            )
+            for record in records
+        )
+        for recipe, record in zip(recipes, records):
+            self.recipe_ids[record['id']] = recipe.pk
+            self.authors.add(recipe.author_id)
+            recipe.created_at = parse_datetime(record['created_at'])
+            recipe.fill_codes()
+        Recipe.objects.bulk_update(
+            recipes, ['created_at', 'short_code', 'slug']
+        )
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(
+                recipe_id=recipe.pk,
+                ingredient_id=self.ingredient_ids[
+                    (item['name'], item['measurement_unit'])
+                ],
+                amount=item['amount']
+            )
+            for recipe, record in zip(recipes, records)
+            for item in record['ingredients']
+        )
+
+    def create_ingredients(self, records):
+        missing = {
+            (item['name'], item['measurement_unit'])
+            for record in records for item in record['ingredients']
+        } - self.ingredient_ids.keys()
+        if not missing:
+            return
+        Ingredient.objects.bulk_create(
+            (
+                Ingredient(name=name, measurement_unit=unit)
+                for name, unit in missing
+            ),
+            ignore_conflicts=True
+        )
+        created = Ingredient.objects.filter(
+            name__in={name for name, _ in missing}
+        ).values_list('pk', 'name', 'measurement_unit')
+        for pk, name, unit in created:
+            self.ingredient_ids[(name, unit)] = pk
+        self.counts['ingredients'] += len(missing)
+
+    def load_relations(self, record_type, records):
+        model, target = transfer.RELATION_TYPES[record_type]
+        targets = (
+            self.user_ids if record_type == 'subscription'
+            else self.recipe_ids
+        )
+        pairs = [
+            (self.user_ids[record['user']], targets[record['target']])
+            for record in records
+            if record['user'] in self.user_ids
+            and record['target'] in targets
+        ]
+        model.objects.bulk_create(
+            (
+                model(user_id=user_id, **{target: target_id})
+                for user_id, target_id in pairs
+            ),
+            ignore_conflicts=True
+        )
+        if model is ShoppingCart:
+            self.cart_users.update(user_id for user_id, _ in pairs)
+        if record_type == 'subscription':
+            self.authors.update(author_id for _, author_id in pairs)
+
+    def finish(self):
+        """Пересчитывает данные, которые ``bulk_create`` не обновляет:
+        счётчики рецептов, итоги списков покупок и ленты подписок.
+        """
+        if self.recipe_ids:
+            bump_recipe_index_version()
+            content_versions.bump_shared()
+        if self.counts['favorite'] or self.counts['cart']:
+            counters.reconcile()
+        shopping_totals.reconcile(sorted(self.cart_users))
+        for author_id in sorted(self.authors):
+            feed.rebuild(author_id)
+        if self.verbosity:
+            self.stdout.write(
+                f'Пользователи: {len(self.user_ids)} '
+                f'(пропущено {self.counts["skipped_users"]}), '
+                f'рецепты: {len(self.recipe_ids)} '
+                f'(пропущено {self.counts["skipped_recipes"]}), '
+                f'новые ингредиенты: {self.counts["ingredients"]}.'
+            )
@@ -1,21 +1,213 @@
+import csv
 import json
 import os
+from itertools import islice
 
 from django.conf import settings
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from foodmanager.catalogue import bump_catalogue_version
 from foodmanager.models import Ingredient
 
+NAME_LENGTH = Ingredient._meta.get_field('name').max_length
+UNIT_LENGTH = Ingredient._meta.get_field('measurement_unit').max_length
+READ_SIZE = 1 << 16
+WHITESPACE = ' \t\r\n'
+
+
+def iter_json_array(file):
+    """Читает JSON-массив по одному элементу, не загружая файл целиком.
+
+    Между элементами обязательна ровно одна запятая, после массива
+    допустимы только пробельные символы.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+
+    def refill():
+        nonlocal buffer, position
+        chunk = file.read(READ_SIZE)
+        if not chunk:
+            return False
+        buffer = buffer[position:] + chunk
+        position = 0
+        return True
+
+    def next_char():
+        """Первый непробельный символ начиная с ``position`` или пустая
+        строка в конце файла.
+        """
+        nonlocal position
+        while True:
+            while position < len(buffer) and buffer[position] in WHITESPACE:
+                position += 1
+            if position < len(buffer):
+                return buffer[position]
+            if not refill():
+                return ''
+
+    if next_char() != '[':
+        raise ValueError('Ожидается JSON-массив.')
+    position += 1
+    if next_char() == ']':
+        position += 1
+    else:
+        while True:
+            next_char()
+            while True:
+                try:
+                    item, end = decoder.raw_decode(buffer, position)
+                except json.JSONDecodeError:
+                    if refill():
+                        continue
+                    raise
+                if end == len(buffer) and refill():
+                    continue
+                break
+            position = end
+            yield item
+            separator = next_char()
+            if separator not in (',', ']'):
+                raise ValueError(
+                    f'Ожидается «,» или «]», найдено {separator!r}.'
+                )
+            position += 1
+            if separator == ']':
+                break
+            if next_char() == ']':
+                raise ValueError('Лишняя запятая перед «]».')
+    if next_char():
+        raise ValueError('Лишние данные после JSON-массива.')
+
+
+def read_json(file):
+    for item in iter_json_array(file):
+        if not isinstance(item, dict):
+            yield None, None
+            continue
+        yield item.get('name'), item.get('measurement_unit')
+
+
+def read_csv(file):
+    for row in csv.reader(file):
+        if row == ['name', 'measurement_unit']:
+            continue
+        if len(row) != 2:
+            yield None, None
+            continue
+        yield row[0], row[1]
+
+
+READERS = {'json': read_json, 'csv': read_csv}
+
+
+def clean(name, unit):
+    if not isinstance(name, str) or not isinstance(unit, str):
+        return None
+    name, unit = name.strip(), unit.strip()
+    if not name or not unit:
+        return None
+    if len(name) > NAME_LENGTH or len(unit) > UNIT_LENGTH:
+        return None
+    return name, unit
+
 
 class Command(BaseCommand):
+    help = (
+        'Загружает ингредиенты из JSON или CSV пачками. Уже существующие '
+        'ингредиенты пропускаются, поэтому команду можно запускать повторно.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?',
+            default=os.path.join(
+                settings.BASE_DIR.parent, 'data', 'ingredients.json'
+            ),
+            help='Файл с ингредиентами (по умолчанию data/ingredients.json).'
+        )
+        parser.add_argument(
+            '--format', choices=READERS,
+            help='Формат файла, если его нельзя понять по расширению.'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать, что будет добавлено.'
+        )
+
     def handle(self, *args, **options):
-        file_path = os.path.join(settings.BASE_DIR.parent, 'data', 'ingredients.json')
-        with open(file_path, 'r', encoding='utf-8') as f:
-            ingredients_data = json.load(f)
-        ingredients_to_create = []
-        for item in ingredients_data:
-            name = item.get('name')
-            measurement_unit = item.get('measurement_unit')
-            ingredients_to_create.append(
-                Ingredient(name=name, measurement_unit=measurement_unit)
+        self.verbosity = options['verbosity']
+        path = options['path']
+        file_format = options['format'] or (
+            os.path.splitext(path)[1].lstrip('.').lower()
+        )
+        if file_format not in READERS:
+            raise CommandError(f'Неизвестный формат файла: {path}')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть положительным.')
+
+        self.added = self.existing = self.invalid = 0
+        self.planned = set()
+        with open(path, encoding='utf-8', newline='') as file:
+            rows = READERS[file_format](file)
+            try:
+                with transaction.atomic():
+                    while True:
+                        batch = list(islice(rows, options['batch_size']))
+                        if not batch:
+                            break
+                        self.load_batch(batch, options['dry_run'])
+            except ValueError as error:
+                raise CommandError(f'Не удалось прочитать {path}: {error}')
+
+        if self.added and not options['dry_run']:
+            bump_catalogue_version()
+        if self.verbosity:
+            action = 'Будет добавлено' if options['dry_run'] else 'Добавлено'
+            self.stdout.write(
+                f'{action}: {self.added}, уже есть: {self.existing}, '
+                f'пропущено с ошибками: {self.invalid}.'
+            )
+
+    def load_batch(self, batch, dry_run):
+        keys = {}
+        valid = 0
+        for row in batch:
+            key = clean(*row)
+            if key is None:
+                self.invalid += 1
+                if self.verbosity > 1:
+                    self.stderr.write(f'Неверная строка: {row!r}')
+                continue
+            keys[key] = None
+            valid += 1
+        existing = set(
+            Ingredient.objects
+            .filter(name__in={name for name, _ in keys})
+            .values_list('name', 'measurement_unit')
+            .order_by()
+        )
+        if dry_run:
+            # Без записи в базу повторы из прошлых пачек ищутся здесь.
+            existing |= self.planned & keys.keys()
+            self.planned.update(keys.keys() - existing)
+        new = [key for key in keys if key not in existing]
+        self.existing += valid - len(new)
+        self.added += len(new)
+        if not dry_run:
+            Ingredient.objects.bulk_create(
+                (
+                    Ingredient(name=name, measurement_unit=unit)
+                    for name, unit in new
+                ),
+                ignore_conflicts=True
+            )
+        if self.verbosity > 1:
+            for name, unit in new:
+                self.stdout.write(f'+ {name}, {unit}')
+        if self.verbosity:
+            self.stdout.write(
+                f'Обработано: {self.added + self.existing + self.invalid}'
             )
-        Ingredient.objects.bulk_create(ingredients_to_create)
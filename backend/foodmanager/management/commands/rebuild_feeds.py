@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from foodmanager import feed
+from foodmanager.models import Recipe
+
+
+class Command(BaseCommand):
+    help = (
+        'Заново строит ленты подписок: рассылает последние рецепты '
+        'авторов подписчикам или переводит авторов с большим числом '
+        'подписчиков на чтение ленты при запросе.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--author', type=int, action='append',
+            help='Перестроить ленты только для рецептов этого автора.'
+        )
+
+    def handle(self, *args, **options):
+        author_ids = options['author'] or list(
+            Recipe.objects.values_list('author_id', flat=True)
+            .distinct().order_by('author_id')
+        )
+        total = len(author_ids)
+        entries = 0
+        for done, author_id in enumerate(author_ids, start=1):
+            entries += feed.rebuild(author_id)
+            if options['verbosity'] and (done % 100 == 0 or done == total):
+                self.stdout.write(f'Авторы: {done}/{total}')
+        if options['verbosity']:
+            self.stdout.write(f'Записей в лентах: {entries}.')
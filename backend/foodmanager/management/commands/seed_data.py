@@ -0,0 +1,208 @@
+import random
+from bisect import bisect
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from foodmanager import content_versions
+from foodmanager.models import (Favorite, Ingredient, Recipe,
+                                RecipeIngredient, ShoppingCart, Subscription,
+                                User)
+from foodmanager.recipe_index import bump_recipe_index_version
+
+WORDS = (
+    'томатный', 'сливочный', 'пряный', 'домашний', 'быстрый', 'летний',
+    'суп', 'салат', 'пирог', 'соус', 'рагу', 'омлет', 'плов', 'паста',
+    'с грибами', 'с курицей', 'с сыром', 'с овощами', 'по-деревенски',
+)
+
+
+class ZipfSampler:
+    """Выбирает элементы с вероятностью, обратной рангу в степени ``s``.
+
+    Ранги назначаются случайной перестановкой элементов, поэтому
+    популярными оказываются не первые созданные объекты.
+    """
+
+    def __init__(self, items, exponent, rng):
+        self.items = list(items)
+        rng.shuffle(self.items)
+        self.cumulative = list(accumulate(
+            1 / rank ** exponent for rank in range(1, len(self.items) + 1)
+        ))
+        self.total = self.cumulative[-1]
+        self.rng = rng
+
+    def __call__(self):
+        position = bisect(self.cumulative, self.rng.random() * self.total)
+        return self.items[min(position, len(self.items) - 1)]
+
+    def sample(self, count):
+        count = min(count, len(self.items))
+        chosen = set()
+        while len(chosen) < count:
+            chosen.add(self())
+        return chosen
+
+
+class Command(BaseCommand):
+    help = (
+        'Генерирует синтетических пользователей, рецепты, избранное, '
+        'списки покупок и подписки для нагрузочного тестирования.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=10000)
+        parser.add_argument('--ingredients-per-recipe', type=int, default=8)
+        parser.add_argument('--favorites', type=int, default=50000)
+        parser.add_argument('--carts', type=int, default=10000)
+        parser.add_argument('--subscriptions', type=int, default=20000)
+        parser.add_argument(
+            '--zipf', type=float, default=1.1,
+            help='Показатель распределения Ципфа для авторов и рецептов.'
+        )
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--prefix', default='seed')
+        parser.add_argument('--password', default='password')
+
+    def handle(self, *args, **options):
+        if not connection.features.can_return_rows_from_bulk_insert:
+            raise CommandError(
+                'База данных не возвращает id из bulk_create.'
+            )
+        if options['users'] < 2:
+            raise CommandError('Нужно минимум два пользователя.')
+
+        self.verbosity = options['verbosity']
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.prefix = options['prefix']
+        self.exponent = options['zipf']
+
+        if User.objects.filter(username=f'{self.prefix}0').exists():
+            raise CommandError(
+                f'Данные с префиксом "{self.prefix}" уже созданы, '
+                f'укажите другой --prefix.'
+            )
+        if not Ingredient.objects.exists():
+            call_command('load_ingredients', verbosity=0)
+
+        user_ids = self.create_users(options['users'], options['password'])
+        authors = ZipfSampler(user_ids, self.exponent, self.rng)
+        recipe_ids = self.create_recipes(
+            options['recipes'], authors, options['ingredients_per_recipe']
+        )
+        if not recipe_ids:
+            return
+        recipes = ZipfSampler(recipe_ids, self.exponent, self.rng)
+
+        self.create_pairs(
+            Favorite, 'recipe_id', options['favorites'], user_ids, recipes
+        )
+        self.create_pairs(
+            ShoppingCart, 'recipe_id', options['carts'], user_ids, recipes
+        )
+        self.create_pairs(
+            Subscription, 'author_id', options['subscriptions'], user_ids,
+            authors
+        )
+        call_command('sync_shopping_totals', verbosity=0)
+        call_command('sync_recipe_counters', verbosity=0)
+        call_command('rebuild_feeds', verbosity=0)
+        bump_recipe_index_version()
+        content_versions.bump_shared()
+
+    def progress(self, message):
+        if self.verbosity:
+            self.stdout.write(message)
+
+    def batches(self, total):
+        for start in range(0, total, self.batch_size):
+            yield range(start, min(start + self.batch_size, total))
+
+    def create_users(self, total, password):
+        password = make_password(password)
+        user_ids = []
+        for batch in self.batches(total):
+            with transaction.atomic():
+                users = User.objects.bulk_create(
+                    User(
+                        email=f'{self.prefix}{number}@example.com',
+                        username=f'{self.prefix}{number}',
+                        first_name=f'Имя{number}',
+                        last_name=f'Фамилия{number}',
+                        password=password,
+                    )
+                    for number in batch
+                )
+            user_ids.extend(user.pk for user in users)
+            self.progress(f'Пользователи: {len(user_ids)}/{total}')
+        return user_ids
+
+    def recipe_name(self):
+        return ' '.join(self.rng.sample(WORDS, 3)).capitalize()
+
+    def create_recipes(self, total, authors, ingredients_per_recipe):
+        ingredients = ZipfSampler(
+            Ingredient.objects.values_list('id', flat=True),
+            self.exponent,
+            self.rng
+        )
+        recipe_ids = []
+        for batch in self.batches(total):
+            with transaction.atomic():
+                recipes = Recipe.objects.bulk_create(
+                    Recipe(
+                        author_id=authors(),
+                        name=f'{self.recipe_name()} №{number}',
+                        text=' '.join(
+                            self.rng.choices(WORDS, k=self.rng.randint(10, 60))
+                        ),
+                        image='recipes/images/seed.png',
+                        cooking_time=self.rng.randint(5, 240),
+                        slug=f'{self.prefix}-recipe-{number}',
+                    )
+                    for number in batch
+                )
+                Recipe.fill_short_codes(recipes)
+                RecipeIngredient.objects.bulk_create(
+                    (
+                        RecipeIngredient(
+                            recipe_id=recipe.pk,
+                            ingredient_id=ingredient_id,
+                            amount=self.rng.randint(1, 1000),
+                        )
+                        for recipe in recipes
+                        for ingredient_id in ingredients.sample(
+                            ingredients_per_recipe
+                        )
+                    ),
+                    batch_size=self.batch_size
+                )
+            recipe_ids.extend(recipe.pk for recipe in recipes)
+            self.progress(f'Рецепты: {len(recipe_ids)}/{total}')
+        return recipe_ids
+
+    def create_pairs(self, model, target_field, total, user_ids, targets):
+        for batch in self.batches(total):
+            pairs = set()
+            for _ in batch:
+                user_id = self.rng.choice(user_ids)
+                target_id = targets()
+                if user_id != target_id or target_field != 'author_id':
+                    pairs.add((user_id, target_id))
+            model.objects.bulk_create(
+                (
+                    model(user_id=user_id, **{target_field: target_id})
+                    for user_id, target_id in sorted(pairs)
+                ),
+                ignore_conflicts=True
+            )
+            self.progress(
+                f'{model._meta.verbose_name_plural}: '
+                f'{batch.stop}/{total}'
+            )
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+from foodmanager import counters
+
+
+class Command(BaseCommand):
+    help = (
+        'Сверяет счётчики избранного и списков покупок у рецептов '
+        'с таблицами связей и исправляет расхождения.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Только проверить, завершиться ошибкой при расхождениях.'
+        )
+
+    def handle(self, *args, **options):
+        drift = counters.reconcile(fix=not options['check'])
+        if options['check'] and drift:
+            raise CommandError(f'Расходящихся рецептов: {drift}.')
+        if options['verbosity']:
+            self.stdout.write(
+                f'Исправлено рецептов: {drift}.' if drift
+                else 'Счётчики рецептов совпадают со связями.'
+            )
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+from foodmanager import shopping_totals
+from foodmanager.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Сверяет материализованные итоги списков покупок с агрегатом '
+        'по рецептам в корзинах и исправляет расхождения.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Только проверить, завершиться ошибкой при расхождениях.'
+        )
+
+    def handle(self, *args, **options):
+        user_ids = (
+            User.objects
+            .filter(
+                Q(shopping_cart__isnull=False)
+                | Q(shopping_totals__isnull=False)
+            )
+            .values_list('pk', flat=True)
+            .distinct()
+            .order_by('pk')
+        )
+        drift = shopping_totals.reconcile(user_ids, fix=not options['check'])
+        if options['check'] and drift:
+            raise CommandError(f'Расходящихся строк: {drift}.')
+        if options['verbosity']:
+            self.stdout.write(
+                f'Исправлено строк: {drift}.' if drift
+                else 'Итоги списков покупок совпадают с корзинами.'
+            )
@@ -0,0 +1,39 @@
+# Generated by Django 4.2 on 2026-10-17 04:04
+
+from django.db import migrations, models
+
+from foodmanager.utils import encode_base62
+
+
+def fill_short_codes(apps, schema_editor):
+    Recipe = apps.get_model('foodmanager', 'Recipe')
+    recipes = Recipe.objects.filter(short_code__isnull=True).only('id')
+    batch = []
+    for recipe in recipes.iterator(chunk_size=1000):
+        recipe.short_code = encode_base62(recipe.id)
+        batch.append(recipe)
+        if len(batch) == 1000:
+            Recipe.objects.bulk_update(batch, ['short_code'])
+            batch = []
+    Recipe.objects.bulk_update(batch, ['short_code'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodmanager', '0002_shoppingcarttotal'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='short_code',
+            field=models.CharField(editable=False, max_length=16, null=True, unique=True, verbose_name='Короткий код'),
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='slug',
+            field=models.SlugField(blank=True, max_length=256, null=True, unique=True, verbose_name='Slug'),
+        ),
+        migrations.RunPython(fill_short_codes, migrations.RunPython.noop),
+    ]
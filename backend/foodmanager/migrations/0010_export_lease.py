@@ -0,0 +1,23 @@
+# Generated by Django 4.2 on 2026-10-17 04:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodmanager', '0009_recipe_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shoppinglistexport',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Последний сигнал обработчика'),
+        ),
+        migrations.AddField(
+            model_name='shoppinglistexport',
+            name='lease',
+            field=models.UUIDField(blank=True, editable=False, null=True, verbose_name='Аренда обработчика'),
+        ),
+    ]
@@ -1,9 +1,12 @@
 from django.contrib.auth.models import AbstractUser
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 from slugify import slugify
 
+from .utils import encode_base62
+
 MIN_VALID = 1
 MAX_VALID = 32000
 
@@ -53,6 +56,12 @@ class User(AbstractUser):
         null=True,
         blank=True,
     )
+    avatar_renditions = models.JSONField(
+        _('Уменьшенные копии аватара'),
+        default=dict,
+        blank=True,
+        editable=False
+    )
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']
@@ -81,6 +90,12 @@ class Recipe(models.Model):
         _('Изображение'),
         upload_to='recipes/images/'
     )
+    image_renditions = models.JSONField(
+        _('Уменьшенные копии изображения'),
+        default=dict,
+        blank=True,
+        editable=False
+    )
     text = models.TextField(
         _('Описание')
     )
@@ -105,21 +120,102 @@ class Recipe(models.Model):
         _('Slug'),
         max_length=256,
         unique=True,
+        null=True,
         blank=True
     )
+    short_code = models.CharField(
+        _('Короткий код'),
+        max_length=16,
+        unique=True,
+        null=True,
+        editable=False
+    )
+    search_vector = SearchVectorField(
+        _('Поисковый вектор'),
+        null=True,
+        editable=False
+    )
+    favorites_count = models.PositiveIntegerField(
+        _('Количество добавлений в избранное'),
+        default=0,
+        editable=False
+    )
+    in_carts_count = models.PositiveIntegerField(
+        _('Количество добавлений в список покупок'),
+        default=0,
+        editable=False
+    )
+    in_timelines = models.BooleanField(
+        _('Разослан в ленты подписчиков'),
+        default=True,
+        editable=False
+    )
 
     class Meta:
         verbose_name = _('Рецепт')
         verbose_name_plural = _('Рецепты')
         ordering = ['-created_at']
+        indexes = [
+            models.Index(
+                fields=['-created_at', '-id'],
+                name='recipe_created_at_id_idx'
+            ),
+            models.Index(
+                fields=['-favorites_count', '-id'],
+                name='recipe_popular_idx'
+            ),
+            models.Index(
+                fields=['author', '-created_at', '-id'],
+                condition=models.Q(in_timelines=False),
+                name='recipe_pull_feed_idx'
+            ),
+        ]
+
+    # Поля, которые меняют отдельные UPDATE (счётчики, копии изображения,
+    # рассылка в ленты); обычное сохранение рецепта их не перезаписывает.
+    UPDATED_SEPARATELY = (
+        'favorites_count', 'in_carts_count', 'image_renditions',
+        'in_timelines',
+    )
 
     def __str__(self):
         return self.name
 
     def save(self, *args, **kwargs):
-        if not self.slug:
-            self.slug = slugify(self.name)
+        if (
+            not self._state.adding
+            and kwargs.get('update_fields') is None
+            and not kwargs.get('force_insert')
+        ):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.UPDATED_SEPARATELY
+            ]
         super().save(*args, **kwargs)
+        if not self.short_code or not self.slug:
+            self.fill_codes()
+            Recipe.objects.filter(pk=self.pk).update(
+                short_code=self.short_code, slug=self.slug
+            )
+
+    def fill_codes(self):
+        self.short_code = self.short_code or encode_base62(self.pk)
+        if not self.slug:
+            self.slug = '-'.join(
+                part for part in (slugify(self.name)[:200], self.short_code)
+                if part
+            )
+
+    @classmethod
+    def fill_short_codes(cls, recipes):
+        recipes = [
+            recipe for recipe in recipes
+            if not recipe.short_code or not recipe.slug
+        ]
+        for recipe in recipes:
+            recipe.fill_codes()
+        cls.objects.bulk_update(recipes, ['short_code', 'slug'])
 
 
 class Favorite(models.Model):
@@ -247,3 +343,158 @@ class ShoppingCart(models.Model):
 
     def __str__(self):
         return f'{self.user.username} - {self.recipe.name}'
+
+
+class ShoppingCartTotal(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_totals',
+        verbose_name=_('Пользователь')
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='shopping_totals',
+        verbose_name=_('Ингредиент')
+    )
+    amount = models.PositiveIntegerField(
+        _('Количество')
+    )
+
+    class Meta:
+        verbose_name = _('Итог списка покупок')
+        verbose_name_plural = _('Итоги списков покупок')
+        ordering = ['user', 'ingredient']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='unique_shopping_cart_total'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.user.username}: {self.ingredient.name} - {self.amount}'
+
+
+class ShoppingListExport(models.Model):
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, _('В очереди')),
+        (RUNNING, _('Выполняется')),
+        (DONE, _('Готово')),
+        (FAILED, _('Ошибка')),
+    )
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_list_exports',
+        verbose_name=_('Пользователь')
+    )
+    status = models.CharField(
+        _('Статус'),
+        max_length=16,
+        choices=STATUSES,
+        default=PENDING
+    )
+    file = models.FileField(
+        _('Файл'),
+        upload_to='exports/',
+        blank=True
+    )
+    error = models.TextField(
+        _('Ошибка'),
+        blank=True
+    )
+    created_at = models.DateTimeField(
+        _('Дата создания'),
+        auto_now_add=True
+    )
+    started_at = models.DateTimeField(
+        _('Начало выполнения'),
+        null=True,
+        blank=True
+    )
+    finished_at = models.DateTimeField(
+        _('Окончание выполнения'),
+        null=True,
+        blank=True
+    )
+    lease = models.UUIDField(
+        _('Аренда обработчика'),
+        null=True,
+        blank=True,
+        editable=False
+    )
+    heartbeat_at = models.DateTimeField(
+        _('Последний сигнал обработчика'),
+        null=True,
+        blank=True,
+        editable=False
+    )
+
+    class Meta:
+        verbose_name = _('Выгрузка списка покупок')
+        verbose_name_plural = _('Выгрузки списков покупок')
+        ordering = ['-id']
+        indexes = [
+            models.Index(
+                fields=['status', 'created_at'],
+                name='export_status_created_at_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.user.username} - {self.get_status_display()}'
+
+
+class FeedEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name=_('Подписчик')
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name=_('Рецепт')
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name=_('Автор')
+    )
+    created_at = models.DateTimeField(
+        _('Дата создания рецепта')
+    )
+
+    class Meta:
+        verbose_name = _('Запись ленты')
+        verbose_name_plural = _('Записи ленты')
+        ordering = ['-created_at', '-recipe_id']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='unique_feed_entry'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-created_at', '-recipe'],
+                name='feed_user_created_at_idx'
+            ),
+            models.Index(
+                fields=['user', 'author'],
+                name='feed_user_author_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.user.username} - {self.recipe.name}'
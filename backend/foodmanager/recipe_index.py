@@ -0,0 +1,237 @@
+import logging
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from heapq import nlargest
+from threading import Lock, Thread, local
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+
+from .models import RecipeIngredient
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = 'recipe-ingredient-index-version'
+BUILD_CHUNK_SIZE = 10000
+
+
+def recipe_index_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, uuid4().hex, timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def bump_recipe_index_version():
+    """Помечает индекс устаревшим после фиксации текущей транзакции.
+    Нужна после массовых изменений; отдельные рецепты обновляет
+    ``refresh_recipe_index``.
+    """
+    transaction.on_commit(
+        lambda: cache.set(VERSION_KEY, uuid4().hex, timeout=None)
+    )
+
+
+class RecipeIngredientIndex:
+    """Обратный индекс: ингредиент -> отсортированный массив id рецептов.
+
+    ``sizes`` хранит число ингредиентов каждого рецепта, чтобы считать
+    покрытие рецепта набором ингредиентов пользователя.
+    """
+
+    def __init__(self, pairs, version=None):
+        self.version = version
+        self.lock = Lock()
+        self.postings = {}
+        self.sizes = Counter()
+        for ingredient_id, recipe_id in pairs:
+            postings = self.postings.get(ingredient_id)
+            if postings is None:
+                postings = self.postings[ingredient_id] = array('q')
+            postings.append(recipe_id)
+            self.sizes[recipe_id] += 1
+
+    def cookable(self, ingredient_ids, limit, complete=False):
+        """Возвращает до ``limit`` кортежей ``(recipe_id, совпало, всего)``
+        по убыванию доли ингредиентов рецепта, которые есть у пользователя.
+
+        При ``complete`` остаются только рецепты, для которых есть все
+        ингредиенты.
+        """
+        sizes = self.sizes
+        matched = Counter()
+        for ingredient_id in set(ingredient_ids):
+            postings = self.postings.get(ingredient_id)
+            if postings:
+                matched.update(postings)
+        if complete:
+            candidates = (
+                recipe_id for recipe_id, hits in matched.items()
+                if hits == sizes[recipe_id]
+            )
+        else:
+            candidates = (
+                recipe_id for recipe_id in matched if sizes[recipe_id]
+            )
+        best = nlargest(
+            limit,
+            candidates,
+            key=lambda recipe_id: (
+                matched[recipe_id] / sizes[recipe_id],
+                matched[recipe_id],
+                recipe_id,
+            )
+        )
+        return [
+            (recipe_id, matched[recipe_id], sizes[recipe_id])
+            for recipe_id in best
+        ]
+
+    def replace_recipes(self, recipe_ids, pairs):
+        """Заменяет ингредиенты рецептов ``recipe_ids`` парами
+        ``(ingredient_id, recipe_id)`` из базы.
+
+        Затронутые массивы и словарь ``sizes`` заменяются копиями, поэтому
+        параллельный ``cookable`` не видит их наполовину изменёнными.
+        """
+        recipe_ids = set(recipe_ids)
+        added = {}
+        for ingredient_id, recipe_id in pairs:
+            added.setdefault(ingredient_id, []).append(recipe_id)
+        with self.lock:
+            changed = set(added)
+            for ingredient_id, postings in self.postings.items():
+                if any(
+                    contains(postings, recipe_id) for recipe_id in recipe_ids
+                ):
+                    changed.add(ingredient_id)
+            for ingredient_id in changed:
+                postings = array('q', (
+                    recipe_id
+                    for recipe_id in self.postings.get(ingredient_id, ())
+                    if recipe_id not in recipe_ids
+                ))
+                for recipe_id in sorted(added.get(ingredient_id, ())):
+                    postings.insert(
+                        bisect_left(postings, recipe_id), recipe_id
+                    )
+                if postings:
+                    self.postings[ingredient_id] = postings
+                else:
+                    self.postings.pop(ingredient_id, None)
+            added_sizes = Counter(
+                recipe_id
+                for recipe_ids_of_ingredient in added.values()
+                for recipe_id in recipe_ids_of_ingredient
+            )
+            sizes = self.sizes.copy()
+            for recipe_id in recipe_ids:
+                if added_sizes[recipe_id]:
+                    sizes[recipe_id] = added_sizes[recipe_id]
+                else:
+                    sizes.pop(recipe_id, None)
+            self.sizes = sizes
+
+
+def contains(postings, recipe_id):
+    position = bisect_left(postings, recipe_id)
+    return position < len(postings) and postings[position] == recipe_id
+
+
+index_lock = Lock()
+current_index = None
+rebuilding = False
+
+
+def load_pairs(recipe_ids=None):
+    pairs = RecipeIngredient.objects.values_list('ingredient_id', 'recipe_id')
+    if recipe_ids is not None:
+        return list(pairs.filter(recipe_id__in=recipe_ids).order_by())
+    return (
+        pairs
+        .order_by('ingredient_id', 'recipe_id')
+        .iterator(chunk_size=BUILD_CHUNK_SIZE)
+    )
+
+
+def rebuild(version):
+    global current_index, rebuilding
+    try:
+        index = RecipeIngredientIndex(load_pairs(), version)
+        with index_lock:
+            current_index = index
+    except Exception:
+        logger.exception('Не удалось пересобрать индекс ингредиентов')
+    finally:
+        rebuilding = False
+        connection.close()
+
+
+def start_rebuild(version):
+    global rebuilding
+    with index_lock:
+        if rebuilding:
+            return
+        rebuilding = True
+    Thread(target=rebuild, args=(version,), daemon=True).start()
+
+
+def recipe_index():
+    """Индекс текущей версии.
+
+    Синхронно индекс строится только один раз при первом обращении.
+    Когда версия меняется в другом процессе, индекс пересобирается в
+    фоновом потоке, а до её окончания отдаётся предыдущий
+    (``RECIPE_INDEX_BACKGROUND_REBUILD=0`` пересобирает сразу).
+    """
+    global current_index
+    version = recipe_index_version()
+    index = current_index
+    if index is not None and index.version == version:
+        return index
+    if index is not None and settings.RECIPE_INDEX_BACKGROUND_REBUILD:
+        start_rebuild(version)
+        return index
+    with index_lock:
+        if current_index is None or current_index.version != version:
+            current_index = RecipeIngredientIndex(load_pairs(), version)
+        return current_index
+
+
+pending = local()
+
+
+def apply_recipe_changes():
+    recipe_ids = getattr(pending, 'recipe_ids', None)
+    if not recipe_ids:
+        return
+    pending.recipe_ids = set()
+    previous = recipe_index_version()
+    version = uuid4().hex
+    cache.set(VERSION_KEY, version, timeout=None)
+    index = current_index
+    if index is None:
+        return
+    index.replace_recipes(recipe_ids, load_pairs(recipe_ids))
+    if index.version == previous:
+        index.version = version
+
+
+def refresh_recipe_index(recipe_ids):
+    """После фиксации транзакции заменяет в индексе этого процесса
+    ингредиенты рецептов ``recipe_ids`` и меняет версию, чтобы остальные
+    процессы пересобрали свои индексы в фоне.
+
+    Рецепты копятся в потоке до фиксации: первый обработчик обновляет
+    все, остальные ничего не делают. Если транзакция откатилась, её
+    рецепты обновятся вместе со следующей, что безопасно, потому что
+    данные берутся из базы.
+    """
+    if getattr(pending, 'recipe_ids', None) is None:
+        pending.recipe_ids = set()
+    pending.recipe_ids.update(recipe_ids)
+    transaction.on_commit(apply_recipe_changes)
@@ -0,0 +1,138 @@
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image, ImageOps
+
+from . import content_versions
+from .utils import setup_django
+
+logger = logging.getLogger(__name__)
+
+RENDITION_SIZES = {
+    'thumbnail': (160, 160),
+    'card': (480, 480),
+    'full': (1280, 1280),
+}
+RENDITION_FORMATS = {
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 4},
+    'jpeg': {'format': 'JPEG', 'quality': 82, 'optimize': True,
+             'progressive': True},
+}
+RENDITION_FIELDS = {
+    'foodmanager.recipe': ('image', 'image_renditions'),
+    'foodmanager.user': ('avatar', 'avatar_renditions'),
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def render(source):
+    """Сохраняет уменьшенные копии файла ``source`` из хранилища медиа
+    и возвращает словарь путей ``{размер: {формат: путь}}``.
+    """
+    with default_storage.open(source) as original:
+        image = ImageOps.exif_transpose(Image.open(original))
+        image.load()
+    if image.mode not in ('RGB', 'L'):
+        background = Image.new('RGB', image.size, 'white')
+        image = image.convert('RGBA')
+        background.paste(image, mask=image.getchannel('A'))
+        image = background
+    elif image.mode == 'L':
+        image = image.convert('RGB')
+
+    directory, filename = os.path.split(source)
+    stem = os.path.splitext(filename)[0]
+    renditions = {'source': source}
+    for name, size in RENDITION_SIZES.items():
+        resized = image.copy()
+        resized.thumbnail(size, Image.LANCZOS)
+        renditions[name] = {}
+        for extension, options in RENDITION_FORMATS.items():
+            buffer = BytesIO()
+            resized.save(buffer, **options)
+            path = f'{directory}/renditions/{stem}-{name}.{extension}'
+            if default_storage.exists(path):
+                default_storage.delete(path)
+            renditions[name][extension] = default_storage.save(
+                path, ContentFile(buffer.getvalue())
+            )
+    return renditions
+
+
+def build(model_label, pk):
+    """Строит копии изображения объекта и сохраняет их пути, если файл
+    не сменился, пока шла обработка.
+    """
+    model = apps.get_model(model_label)
+    field, renditions_field = RENDITION_FIELDS[model._meta.label_lower]
+    source = (
+        model.objects.filter(pk=pk).values_list(field, flat=True).first()
+    )
+    if not source:
+        return None
+    renditions = render(source)
+    updated = model.objects.filter(pk=pk, **{field: source}).update(
+        **{renditions_field: renditions}
+    )
+    if updated:
+        content_versions.bump_object(model._meta.label_lower, pk)
+    return renditions
+
+
+def executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.IMAGE_RENDITION_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=setup_django
+            )
+        return _executor
+
+
+def log_failure(future):
+    error = future.exception()
+    if error is not None:
+        logger.error('Не удалось построить копии изображения: %r', error)
+
+
+def submit(model_label, pk):
+    if not settings.IMAGE_RENDITION_WORKERS:
+        return build(model_label, pk)
+    future = executor().submit(build, model_label, pk)
+    future.add_done_callback(log_failure)
+    return future
+
+
+def is_stale(instance):
+    field, renditions_field = RENDITION_FIELDS[instance._meta.label_lower]
+    source = getattr(instance, field).name or None
+    renditions = getattr(instance, renditions_field) or {}
+    return renditions.get('source') != source
+
+
+def schedule(instance):
+    """Ставит построение копий в очередь после фиксации транзакции."""
+    field, renditions_field = RENDITION_FIELDS[instance._meta.label_lower]
+    if not getattr(instance, field):
+        type(instance).objects.filter(pk=instance.pk).update(
+            **{renditions_field: {}}
+        )
+        setattr(instance, renditions_field, {})
+        return
+    transaction.on_commit(
+        lambda: submit(instance._meta.label_lower, instance.pk),
+        robust=True
+    )
@@ -0,0 +1,166 @@
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connections
+from django.db.models import F
+
+SEARCH_CONFIG = 'russian'
+RECIPE_TABLE = 'foodmanager_recipe'
+FTS_TABLE = 'foodmanager_recipe_fts'
+FTS_NAME_WEIGHT = 10.0
+FTS_TEXT_WEIGHT = 1.0
+FTS_PREFIX_MIN_LENGTH = 3
+FTS_TRIGGERS = ('recipe_fts_insert', 'recipe_fts_delete', 'recipe_fts_update')
+
+POSTGRES_INSTALL = (
+    f"""
+    CREATE OR REPLACE FUNCTION recipe_search_vector_update()
+    RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('{SEARCH_CONFIG}',
+                                  coalesce(NEW.name, '')), 'A')
+            || setweight(to_tsvector('{SEARCH_CONFIG}',
+                                     coalesce(NEW.text, '')), 'B');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    f'DROP TRIGGER IF EXISTS recipe_search_vector_trigger ON {RECIPE_TABLE}',
+    f"""
+    CREATE TRIGGER recipe_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF name, text ON {RECIPE_TABLE}
+    FOR EACH ROW EXECUTE FUNCTION recipe_search_vector_update()
+    """,
+    f'UPDATE {RECIPE_TABLE} SET name = name WHERE search_vector IS NULL',
+    f"""
+    CREATE INDEX IF NOT EXISTS recipe_search_vector_idx
+    ON {RECIPE_TABLE} USING GIN (search_vector)
+    """,
+)
+POSTGRES_UNINSTALL = (
+    'DROP INDEX IF EXISTS recipe_search_vector_idx',
+    f'DROP TRIGGER IF EXISTS recipe_search_vector_trigger ON {RECIPE_TABLE}',
+    'DROP FUNCTION IF EXISTS recipe_search_vector_update()',
+)
+
+SQLITE_INSTALL = (
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        name, text, content='{RECIPE_TABLE}', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS recipe_fts_insert
+    AFTER INSERT ON {RECIPE_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, name, text)
+        VALUES (new.id, new.name, new.text);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS recipe_fts_delete
+    AFTER DELETE ON {RECIPE_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, text)
+        VALUES ('delete', old.id, old.name, old.text);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS recipe_fts_update
+    AFTER UPDATE OF name, text ON {RECIPE_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, text)
+        VALUES ('delete', old.id, old.name, old.text);
+        INSERT INTO {FTS_TABLE}(rowid, name, text)
+        VALUES (new.id, new.name, new.text);
+    END
+    """,
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+)
+SQLITE_UNINSTALL = tuple(
+    f'DROP TRIGGER IF EXISTS {trigger}' for trigger in FTS_TRIGGERS
+) + (f'DROP TABLE IF EXISTS {FTS_TABLE}',)
+
+
+def install(connection):
+    """Создаёт полнотекстовый индекс рецептов и триггеры, которые
+    обновляют его при вставке и изменении рецептов.
+    """
+    statements = {
+        'postgresql': POSTGRES_INSTALL,
+        'sqlite': SQLITE_INSTALL,
+    }.get(connection.vendor, ())
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def uninstall(connection):
+    statements = {
+        'postgresql': POSTGRES_UNINSTALL,
+        'sqlite': SQLITE_UNINSTALL,
+    }.get(connection.vendor, ())
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def ensure_sqlite_triggers(connection):
+    """Восстанавливает триггеры FTS5, если SQLite пересоздал таблицу
+    рецептов при миграции и они пропали вместе со старой таблицей.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master "
+            "WHERE type IN ('table', 'trigger') AND name IN (%s, %s, %s, %s)",
+            (FTS_TABLE,) + FTS_TRIGGERS
+        )
+        existing = {row[0] for row in cursor.fetchall()}
+    if FTS_TABLE in existing and existing != {FTS_TABLE, *FTS_TRIGGERS}:
+        install(connection)
+
+
+def fts_query(text):
+    """Строит запрос FTS5 из слов ``text``: все слова обязательны, слова
+    от ``FTS_PREFIX_MIN_LENGTH`` букв ищутся по префиксу, что отчасти
+    заменяет стемминг.
+    """
+    words = re.findall(r'\w+', text.lower())
+    return ' '.join(
+        f'"{word}"*' if len(word) >= FTS_PREFIX_MIN_LENGTH else f'"{word}"'
+        for word in words
+    )
+
+
+def search_recipes(queryset, text):
+    """Оставляет в ``queryset`` рецепты, подходящие под ``text``, и
+    сортирует их по релевантности (аннотация ``search_rank``).
+    """
+    vendor = connections[queryset.db].vendor
+    if vendor == 'postgresql':
+        query = SearchQuery(
+            text, config=SEARCH_CONFIG, search_type='websearch'
+        )
+        return queryset.filter(search_vector=query).annotate(
+            search_rank=SearchRank(F('search_vector'), query)
+        ).order_by('-search_rank', '-id')
+
+    if vendor == 'sqlite':
+        match = fts_query(text)
+        if not match:
+            return queryset.none()
+        return queryset.extra(
+            select={'search_rank': f'-bm25({FTS_TABLE}, %s, %s)'},
+            select_params=(FTS_NAME_WEIGHT, FTS_TEXT_WEIGHT),
+            tables=[FTS_TABLE],
+            where=[
+                f'{FTS_TABLE}.rowid = {RECIPE_TABLE}.id',
+                f'{FTS_TABLE} MATCH %s',
+            ],
+            params=[match],
+        ).order_by('-search_rank', '-id')
+
+    for word in text.split():
+        queryset = queryset.filter(name__icontains=word)
+    return queryset
@@ -0,0 +1,169 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import F, Sum
+
+from .models import RecipeIngredient, ShoppingCart, ShoppingCartTotal, User
+
+BATCH_SIZE = 1000
+
+
+def chunks(values, size=BATCH_SIZE):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def recipe_amounts(recipe_ids):
+    amounts = defaultdict(int)
+    rows = (
+        RecipeIngredient.objects
+        .filter(recipe_id__in=recipe_ids)
+        .values_list('ingredient_id', 'amount')
+        .order_by()
+    )
+    for ingredient_id, amount in rows:
+        amounts[ingredient_id] += amount
+    return amounts
+
+
+def amount_deltas(old_amounts, new_amounts):
+    return {
+        ingredient_id: (
+            new_amounts.get(ingredient_id, 0)
+            - old_amounts.get(ingredient_id, 0)
+        )
+        for ingredient_id in old_amounts.keys() | new_amounts.keys()
+    }
+
+
+def apply_deltas(user_ids, deltas):
+    """Прибавляет ``deltas`` ({ingredient_id: количество}) к итогам
+    пользователей ``user_ids``. Строки с неположительным итогом удаляются.
+    """
+    deltas = {
+        ingredient_id: delta
+        for ingredient_id, delta in deltas.items() if delta
+    }
+    if not deltas:
+        return
+    with transaction.atomic(savepoint=False):
+        for batch in chunks(sorted(set(user_ids))):
+            list(
+                User.objects.select_for_update()
+                .filter(pk__in=batch).values_list('pk', flat=True)
+                .order_by('pk')
+            )
+            existing = {
+                (row.user_id, row.ingredient_id): row
+                for row in ShoppingCartTotal.objects.filter(
+                    user_id__in=batch, ingredient_id__in=deltas
+                ).order_by()
+            }
+            to_create, to_update, to_delete = [], [], []
+            for user_id in batch:
+                for ingredient_id, delta in deltas.items():
+                    row = existing.get((user_id, ingredient_id))
+                    if row is None:
+                        if delta > 0:
+                            to_create.append(ShoppingCartTotal(
+                                user_id=user_id,
+                                ingredient_id=ingredient_id,
+                                amount=delta
+                            ))
+                        continue
+                    row.amount += delta
+                    if row.amount > 0:
+                        to_update.append(row)
+                    else:
+                        to_delete.append(row.pk)
+            ShoppingCartTotal.objects.bulk_create(to_create)
+            ShoppingCartTotal.objects.bulk_update(to_update, ['amount'])
+            ShoppingCartTotal.objects.filter(pk__in=to_delete).delete()
+
+
+def add_recipes(user_id, recipe_ids):
+    apply_deltas([user_id], recipe_amounts(recipe_ids))
+
+
+def remove_recipes(user_id, recipe_ids):
+    amounts = recipe_amounts(recipe_ids)
+    apply_deltas([user_id], {
+        ingredient_id: -amount for ingredient_id, amount in amounts.items()
+    })
+
+
+def cart_user_ids(recipe_id):
+    return ShoppingCart.objects.filter(
+        recipe_id=recipe_id
+    ).values_list('user_id', flat=True).order_by()
+
+
+def change_recipe(recipe_id, deltas):
+    """Переносит изменение ингредиентов рецепта в итоги всех
+    пользователей, у которых рецепт лежит в списке покупок.
+    """
+    apply_deltas(cart_user_ids(recipe_id), deltas)
+
+
+def shopping_list(user_id):
+    return (
+        ShoppingCartTotal.objects
+        .filter(user_id=user_id)
+        .values(
+            'ingredient__name',
+            'ingredient__measurement_unit',
+            total=F('amount')
+        )
+        .order_by('ingredient__name', 'ingredient__measurement_unit')
+    )
+
+
+def live_totals(user_ids):
+    totals = {}
+    rows = (
+        RecipeIngredient.objects
+        .filter(recipe__in_shopping_cart__user_id__in=user_ids)
+        .values_list('recipe__in_shopping_cart__user_id', 'ingredient_id')
+        .annotate(total=Sum('amount'))
+        .order_by()
+    )
+    for user_id, ingredient_id, total in rows:
+        totals[user_id, ingredient_id] = total
+    return totals
+
+
+def reconcile(user_ids, fix=True):
+    """Сверяет итоги пользователей с живым агрегатом по спискам покупок.
+
+    Возвращает число расходящихся строк; при ``fix`` исправляет их.
+    """
+    drift = 0
+    for batch in chunks(user_ids):
+        with transaction.atomic():
+            expected = live_totals(batch)
+            stored = {
+                (row.user_id, row.ingredient_id): row
+                for row in ShoppingCartTotal.objects.filter(
+                    user_id__in=batch
+                ).order_by()
+            }
+            to_create, to_update = [], []
+            for key, total in expected.items():
+                row = stored.get(key)
+                if row is None:
+                    to_create.append(ShoppingCartTotal(
+                        user_id=key[0], ingredient_id=key[1], amount=total
+                    ))
+                elif row.amount != total:
+                    row.amount = total
+                    to_update.append(row)
+            to_delete = [
+                row.pk for key, row in stored.items() if key not in expected
+            ]
+            drift += len(to_create) + len(to_update) + len(to_delete)
+            if fix:
+                ShoppingCartTotal.objects.bulk_create(to_create)
+                ShoppingCartTotal.objects.bulk_update(to_update, ['amount'])
+                ShoppingCartTotal.objects.filter(pk__in=to_delete).delete()
+    return drift
@@ -0,0 +1,91 @@
+from django.db import connections
+from django.db.models.signals import (post_delete, post_migrate, post_save,
+                                      pre_delete)
+from django.dispatch import receiver
+
+from . import (content_versions, counters, feed, renditions, search,
+               shopping_totals)
+from .catalogue import bump_catalogue_version
+from .models import (Ingredient, Recipe, RecipeIngredient, Subscription,
+                     User)
+from .recipe_index import refresh_recipe_index
+
+
+@receiver(pre_delete, sender=Recipe)
+def remove_recipe_from_shopping_totals(sender, instance, **kwargs):
+    amounts = shopping_totals.recipe_amounts([instance.pk])
+    shopping_totals.change_recipe(instance.pk, {
+        ingredient_id: -amount for ingredient_id, amount in amounts.items()
+    })
+
+
+@receiver(pre_delete, sender=User)
+def remove_user_from_recipe_counters(sender, instance, **kwargs):
+    counters.remove_user(instance.pk)
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_ingredient_catalogue(sender, **kwargs):
+    bump_catalogue_version()
+    content_versions.bump_shared()
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=User)
+def schedule_image_renditions(sender, instance, **kwargs):
+    if renditions.is_stale(instance):
+        renditions.schedule(instance)
+
+
+@receiver(post_save, sender=Recipe)
+def publish_recipe_to_feeds(sender, instance, created, **kwargs):
+    if created:
+        feed.publish(instance)
+
+
+@receiver(post_save, sender=Subscription)
+def fill_subscriber_feed(sender, instance, created, **kwargs):
+    if created:
+        feed.follow(instance.user_id, instance.author_id)
+
+
+@receiver(post_migrate)
+def restore_search_triggers(sender, using, **kwargs):
+    if sender.name == 'foodmanager':
+        search.ensure_sqlite_triggers(connections[using])
+
+
+@receiver(post_delete, sender=Recipe)
+def remove_recipe_from_index(sender, instance, **kwargs):
+    refresh_recipe_index([instance.pk])
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+def refresh_recipe_in_index(sender, instance, **kwargs):
+    refresh_recipe_index([instance.recipe_id])
+
+
+@receiver(post_save, sender=Recipe)
+def invalidate_recipe_responses(sender, instance, **kwargs):
+    content_versions.bump_recipes([instance.pk])
+
+
+@receiver(post_delete, sender=Recipe)
+def forget_recipe_responses(sender, instance, **kwargs):
+    content_versions.forget_recipe(instance.pk)
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+def invalidate_recipe_ingredient_responses(sender, instance, **kwargs):
+    content_versions.bump_recipes([instance.recipe_id])
+
+
+@receiver(post_save, sender=User)
+def invalidate_author_responses(sender, instance, created, update_fields,
+                                **kwargs):
+    if created or update_fields and set(update_fields) <= {'last_login'}:
+        return
+    content_versions.bump_author(instance.pk)
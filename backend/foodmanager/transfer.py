@@ -0,0 +1,51 @@
+import json
+
+from .models import Favorite, ShoppingCart, Subscription
+
+USER_FIELDS = (
+    'email', 'username', 'first_name', 'last_name', 'password', 'avatar'
+)
+RECIPE_FIELDS = ('name', 'text', 'image', 'cooking_time')
+RELATION_TYPES = {
+    'favorite': (Favorite, 'recipe_id'),
+    'cart': (ShoppingCart, 'recipe_id'),
+    'subscription': (Subscription, 'author_id'),
+}
+
+
+def dump(record):
+    """Строка NDJSON для записи ``record``."""
+    return json.dumps(record, ensure_ascii=False, separators=(',', ':'))
+
+
+def user_record(user):
+    record = {'type': 'user', 'id': user.pk}
+    for field in USER_FIELDS:
+        value = getattr(user, field)
+        record[field] = value.name if field == 'avatar' else value
+    return record
+
+
+def recipe_record(recipe):
+    record = {
+        'type': 'recipe',
+        'id': recipe.pk,
+        'author': recipe.author_id,
+        'created_at': recipe.created_at.isoformat(),
+        'ingredients': [
+            {
+                'name': item.ingredient.name,
+                'measurement_unit': item.ingredient.measurement_unit,
+                'amount': item.amount,
+            }
+            for item in recipe.recipe_ingredients.all()
+        ],
+    }
+    for field in RECIPE_FIELDS:
+        value = getattr(recipe, field)
+        record[field] = value.name if field == 'image' else value
+    return record
+
+
+def relation_record(record_type, user_id, target_id):
+    return {'type': record_type, 'user': user_id, 'target': target_id}
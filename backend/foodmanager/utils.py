@@ -0,0 +1,41 @@
+import os
+import string
+
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+
+BASE62_ALPHABET = string.digits + string.ascii_letters
+
+
+def encode_base62(number):
+    if number < 0:
+        raise ValueError('Ожидается неотрицательное число.')
+    digits = []
+    while True:
+        number, remainder = divmod(number, len(BASE62_ALPHABET))
+        digits.append(BASE62_ALPHABET[remainder])
+        if not number:
+            return ''.join(reversed(digits))
+
+
+def setup_django():
+    """Инициализирует Django в дочернем процессе пула."""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+    import django
+
+    django.setup()
+
+
+def require_shared_cache():
+    """Проверяет, что кэш ``default`` общий для процессов.
+
+    В нём лежат версии каталога ингредиентов, индекса рецептов и кэша
+    ответов. Их меняют и команды управления, и воркеры, поэтому с кэшем
+    в памяти процесса веб-процессы продолжали бы отдавать старые данные.
+    """
+    if isinstance(caches['default'], LocMemCache):
+        raise ImproperlyConfigured(
+            'Кэш default должен быть общим для процессов (Redis, '
+            'Memcached, FileBasedCache), а не LocMemCache.'
+        )
@@ -0,0 +1,202 @@
+import json
+import statistics
+from dataclasses import dataclass, field
+from pathlib import Path
+from time import perf_counter
+
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+BASELINE_PATH = Path(__file__).resolve().parent / 'benchmark_baseline.json'
+
+PNG_1PX = (
+    'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUl'
+    'EQVR42mP8z8BQDwAEhQGAhKmMIQAAAABJRU5ErkJggg=='
+)
+
+
+@dataclass(frozen=True)
+class Case:
+    """Одно обращение к эндпоинту, которое измеряет бенчмарк.
+
+    ``path`` и значения ``data`` форматируются атрибутами набора данных
+    (``{recipe}``, ``{author}`` и т.д.). Если заданы ``page_sizes``,
+    запрос выполняется с каждым значением ``limit``, и число SQL-запросов
+    не должно зависеть от размера страницы. ``settings`` переопределяет
+    настройки Django на время измерения.
+    """
+
+    route: str
+    method: str
+    path: str
+    client: str = 'user'
+    data: dict = field(default_factory=dict)
+    status: int = 200
+    page_sizes: tuple = ()
+    label: str = ''
+    settings: dict = field(default_factory=dict)
+
+    @property
+    def id(self):
+        suffix = f'[{self.label}]' if self.label else ''
+        return f'{self.method.upper()} {self.route}{suffix}'
+
+    def build_path(self, dataset, page_size=None):
+        path = self.path.format(**vars(dataset))
+        if page_size is not None:
+            separator = '&' if '?' in path else '?'
+            path = f'{path}{separator}limit={page_size}'
+        return path
+
+    def build_data(self, dataset):
+        return {
+            key: format_value(value, dataset)
+            for key, value in self.data.items()
+        }
+
+
+def format_value(value, dataset):
+    if isinstance(value, str):
+        return value.format(**vars(dataset))
+    if isinstance(value, list):
+        return [format_value(item, dataset) for item in value]
+    if isinstance(value, dict):
+        return {
+            key: format_value(item, dataset) for key, item in value.items()
+        }
+    return value
+
+
+@dataclass
+class Measurement:
+    queries: int
+    sql_ms: float
+    p50_ms: float
+    p95_ms: float
+
+    def as_dict(self):
+        return {
+            'queries': self.queries,
+            'sql_ms': round(self.sql_ms, 3),
+            'p50_ms': round(self.p50_ms, 3),
+            'p95_ms': round(self.p95_ms, 3),
+        }
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, round(fraction * (len(ordered) - 1)))
+    return ordered[index]
+
+
+def perform(client, case, dataset, page_size=None):
+    method = getattr(client, case.method.lower())
+    response = method(
+        case.build_path(dataset, page_size),
+        case.build_data(dataset) or None,
+        format='json'
+    )
+    if response.streaming:
+        b''.join(response.streaming_content)
+    return response
+
+
+def measure(client, case, dataset, rounds, page_size=None):
+    """Выполняет запрос ``rounds`` раз после одного прогревочного.
+
+    Каждый вызов обёрнут в точку сохранения, которая откатывается, поэтому
+    изменяющие запросы видят одно и то же состояние базы на каждом круге.
+    """
+    latencies = []
+    queries = 0
+    sql_times = []
+    for round_number in range(rounds + 1):
+        with transaction.atomic():
+            with CaptureQueriesContext(connection) as captured:
+                started = perf_counter()
+                response = perform(client, case, dataset, page_size)
+                elapsed = perf_counter() - started
+            transaction.set_rollback(True)
+
+        assert response.status_code == case.status, (
+            f'{case.id}: {response.status_code} '
+            f'{getattr(response, "data", response.content)!r}'
+        )
+        if not round_number:
+            continue
+        latencies.append(elapsed * 1000)
+        queries = max(queries, len(captured))
+        sql_times.append(sum(
+            float(query['time']) for query in captured.captured_queries
+        ) * 1000)
+
+    return Measurement(
+        queries=queries,
+        sql_ms=statistics.mean(sql_times),
+        p50_ms=percentile(latencies, 0.5),
+        p95_ms=percentile(latencies, 0.95),
+    )
+
+
+def load_baseline():
+    if not BASELINE_PATH.exists():
+        return {}
+    with open(BASELINE_PATH, encoding='utf-8') as baseline_file:
+        return json.load(baseline_file)
+
+
+def save_baseline(results):
+    baseline = load_baseline()
+    baseline.update(results)
+    with open(BASELINE_PATH, 'w', encoding='utf-8') as baseline_file:
+        json.dump(
+            dict(sorted(baseline.items())),
+            baseline_file,
+            ensure_ascii=False,
+            indent=2
+        )
+        baseline_file.write('\n')
+
+
+def regressions(key, measurement, baseline, latency=None):
+    """Сравнивает измерение с базовым и возвращает список нарушений.
+
+    Число SQL-запросов сравнивается всегда. Задержки зависят от машины,
+    поэтому p50 проверяется, только если передан ``latency`` — пара
+    ``(tolerance, slack_ms)``: допустимый относительный рост и абсолютный
+    запас в миллисекундах.
+    """
+    expected = baseline.get(key)
+    if expected is None:
+        return []
+    problems = []
+    if measurement.queries > expected['queries']:
+        problems.append(
+            f'{key}: {measurement.queries} SQL-запросов, '
+            f'в базовой линии {expected["queries"]}'
+        )
+    if latency is not None and 'p50_ms' in expected:
+        tolerance, slack_ms = latency
+        allowed_ms = expected['p50_ms'] * (1 + tolerance) + slack_ms
+        if measurement.p50_ms > allowed_ms:
+            problems.append(
+                f'{key}: p50 {measurement.p50_ms:.1f} мс, '
+                f'допустимо {allowed_ms:.1f} мс'
+            )
+    return problems
+
+
+def check(request, key, measurement):
+    """Запоминает измерение и сравнивает его с базовой линией."""
+    config = request.config
+    config.benchmark_results[key] = measurement.as_dict()
+    if config.getoption('--benchmark-update'):
+        return
+    latency = None
+    if config.getoption('--benchmark-latency'):
+        latency = (
+            config.getoption('--benchmark-tolerance'),
+            config.getoption('--benchmark-slack-ms'),
+        )
+    problems = regressions(key, measurement, load_baseline(), latency)
+    assert not problems, '\n'.join(problems)
@@ -0,0 +1,290 @@
+import os
+import random
+from base64 import b64decode
+from types import SimpleNamespace
+
+import pytest
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db.models import Count
+from django.test import override_settings
+from api import exports
+from foodmanager.models import (Favorite, Ingredient, Recipe,
+                                RecipeIngredient, ShoppingCart,
+                                ShoppingListExport, Subscription, User)
+from reportlab import rl_config
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from . import benchmarks
+
+SEED = 20240601
+PASSWORD = 'benchmark-password'
+USERS = 80
+RECIPES = 400
+INGREDIENTS_PER_RECIPE = 8
+FOLLOWED_AUTHORS = 60
+FAVORITES = 60
+CART_RECIPES = 20
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup('benchmark')
+    group.addoption(
+        '--benchmark-rounds', type=int, default=10,
+        help='Количество измеряемых запросов на эндпоинт.'
+    )
+    group.addoption(
+        '--benchmark-latency', action='store_true',
+        help='Проверять и p50, а не только число SQL-запросов.'
+    )
+    group.addoption(
+        '--benchmark-tolerance', type=float, default=1.0,
+        help='Допустимый относительный рост p50 относительно базовой линии.'
+    )
+    group.addoption(
+        '--benchmark-slack-ms', type=float, default=5.0,
+        help='Абсолютный запас по p50 в миллисекундах.'
+    )
+    group.addoption(
+        '--benchmark-update', action='store_true',
+        help='Записать результаты в tests/benchmark_baseline.json.'
+    )
+
+
+def pytest_configure(config):
+    config.benchmark_results = {}
+
+
+def pytest_sessionfinish(session):
+    config = session.config
+    if config.getoption('--benchmark-update') and config.benchmark_results:
+        benchmarks.save_baseline(config.benchmark_results)
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    if not config.benchmark_results:
+        return
+    terminalreporter.section('benchmark')
+    for key, result in sorted(config.benchmark_results.items()):
+        terminalreporter.write_line(
+            f'{key:<60} {result["queries"]:>4} q '
+            f'{result["sql_ms"]:>8.2f} sql ms '
+            f'{result["p50_ms"]:>8.2f} p50 ms '
+            f'{result["p95_ms"]:>8.2f} p95 ms'
+        )
+
+
+@pytest.fixture(scope='session', autouse=True)
+def test_settings(tmp_path_factory):
+    with override_settings(
+        MEDIA_ROOT=str(tmp_path_factory.mktemp('media')),
+        CACHES={
+            'default': {
+                'BACKEND':
+                    'django.core.cache.backends.filebased.FileBasedCache',
+                'LOCATION': str(tmp_path_factory.mktemp('cache')),
+                'OPTIONS': {'MAX_ENTRIES': 100000},
+            },
+            'responses': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                'LOCATION': 'responses',
+                'TIMEOUT': None,
+            },
+        },
+        PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+        IMAGE_RENDITION_WORKERS=0,
+        RESPONSE_CACHE_ALIAS='',
+        RECIPE_INDEX_BACKGROUND_REBUILD=False,
+    ):
+        yield
+
+
+@pytest.fixture(scope='session', autouse=True)
+def pdf_font():
+    from api import pdf
+
+    if os.path.exists(pdf.PDF_FONT_PATH):
+        yield
+        return
+    original = pdf.PDF_FONT_PATH
+    pdf.PDF_FONT_PATH = os.path.join(
+        os.path.dirname(rl_config.__file__), 'fonts', 'Vera.ttf'
+    )
+    yield
+    pdf.PDF_FONT_PATH = original
+
+
+def seed_dataset():
+    call_command(
+        'seed_data',
+        users=USERS,
+        recipes=RECIPES,
+        ingredients_per_recipe=INGREDIENTS_PER_RECIPE,
+        favorites=USERS * 5,
+        carts=USERS * 2,
+        subscriptions=USERS * 4,
+        seed=SEED,
+        password=PASSWORD,
+        verbosity=0,
+    )
+    rng = random.Random(SEED)
+    ingredient_ids = list(Ingredient.objects.values_list('id', flat=True))
+    authors = list(
+        User.objects.annotate(recipes_number=Count('recipes'))
+        .order_by('-recipes_number', 'id')
+    )
+    author = authors[0]
+
+    admin = User.objects.create_superuser(
+        email='admin@example.com',
+        username='admin',
+        first_name='Админ',
+        last_name='Бенчмарков',
+        password=PASSWORD,
+    )
+    viewer = User.objects.create_user(
+        email='viewer@example.com',
+        username='viewer',
+        first_name='Зритель',
+        last_name='Бенчмарков',
+        password=PASSWORD,
+    )
+    own_recipe = Recipe.objects.create(
+        author=viewer,
+        name='Рецепт зрителя',
+        text='Описание рецепта.',
+        image='recipes/images/own.png',
+        cooking_time=10,
+    )
+    RecipeIngredient.objects.bulk_create(
+        RecipeIngredient(recipe=own_recipe, ingredient_id=ingredient_id,
+                         amount=rng.randint(1, 500))
+        for ingredient_id in rng.sample(ingredient_ids, INGREDIENTS_PER_RECIPE)
+    )
+
+    others = list(Recipe.objects.exclude(author=viewer).order_by('id'))
+    favorites = rng.sample(others, FAVORITES)
+    Favorite.objects.bulk_create(
+        Favorite(user=viewer, recipe=recipe) for recipe in favorites
+    )
+    cart = rng.sample(others, CART_RECIPES)
+    ShoppingCart.objects.bulk_create(
+        ShoppingCart(user=viewer, recipe=recipe) for recipe in cart
+    )
+    call_command('sync_shopping_totals', verbosity=0)
+    call_command('sync_recipe_counters', verbosity=0)
+    export = ShoppingListExport.objects.create(user=viewer)
+    exports.run(*exports.claim(1)[0])
+    followed = authors[:FOLLOWED_AUTHORS]
+    Subscription.objects.bulk_create(
+        Subscription(user=viewer, author=followed_author)
+        for followed_author in followed
+    )
+    call_command('rebuild_feeds', verbosity=0)
+
+    free_recipe = next(
+        recipe for recipe in others
+        if recipe not in favorites and recipe not in cart
+    )
+    return SimpleNamespace(
+        admin=admin.id,
+        viewer=viewer.id,
+        viewer_token=Token.objects.create(user=viewer).key,
+        viewer_email=viewer.email,
+        password=PASSWORD,
+        author=author.id,
+        followed_author=followed[0].id,
+        unfollowed_author=authors[-1].id,
+        recipe=free_recipe.id,
+        favorited_recipe=favorites[0].id,
+        cart_recipe=cart[0].id,
+        own_recipe=own_recipe.id,
+        short_link=own_recipe.short_code,
+        export=export.id,
+        ingredient=ingredient_ids[0],
+        ingredients=','.join(map(str, ingredient_ids[:3])),
+        image=benchmarks.PNG_1PX,
+    )
+
+
+@pytest.fixture(scope='session')
+def dataset(django_db_setup, django_db_blocker):
+    with django_db_blocker.unblock():
+        return seed_dataset()
+
+
+@pytest.fixture
+def clients(dataset, db):
+    user = APIClient()
+    user.credentials(HTTP_AUTHORIZATION=f'Token {dataset.viewer_token}')
+    admin = APIClient()
+    admin.force_login(User.objects.get(pk=dataset.admin))
+    return {'anon': APIClient(), 'user': user, 'admin': admin}
+
+
+@pytest.fixture
+def make_user(db):
+    def make(username, **fields):
+        return User.objects.create_user(
+            email=f'{username}@example.com',
+            username=username,
+            first_name='Имя',
+            last_name='Фамилия',
+            password=PASSWORD,
+            **fields
+        )
+    return make
+
+
+@pytest.fixture
+def ingredients(db):
+    return Ingredient.objects.bulk_create(
+        Ingredient(name=f'Тестовый ингредиент {number}',
+                   measurement_unit='г')
+        for number in range(5)
+    )
+
+
+@pytest.fixture
+def recipe_image(db):
+    name = 'recipes/images/test.png'
+    if not default_storage.exists(name):
+        default_storage.save(name, ContentFile(b64decode(
+            benchmarks.PNG_1PX.split(',', 1)[1]
+        )))
+    return name
+
+
+@pytest.fixture
+def make_recipe(recipe_image):
+    """Рецепт с ингредиентами ``amounts`` ({ингредиент: количество})."""
+    def make(author, amounts, name='Тестовый рецепт',
+             text='Описание рецепта.', **fields):
+        recipe = Recipe.objects.create(
+            author=author,
+            name=name,
+            text=text,
+            image=recipe_image,
+            cooking_time=10,
+            **fields
+        )
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe=recipe, ingredient=ingredient,
+                             amount=amount)
+            for ingredient, amount in amounts.items()
+        )
+        return recipe
+    return make
+
+
+@pytest.fixture
+def api_client(db):
+    """Клиент API, при ``user`` — от имени этого пользователя."""
+    def make(user=None):
+        client = APIClient()
+        if user is not None:
+            client.force_authenticate(user)
+        return client
+    return make
@@ -0,0 +1,122 @@
+import pytest
+from api.serializers import MAX_BULK_IDS
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from foodmanager import counters
+from foodmanager.models import Favorite, Recipe, ShoppingCart
+
+ENDPOINTS = {
+    Favorite: '/api/recipes/favorite/bulk/',
+    ShoppingCart: '/api/recipes/shopping_cart/bulk/',
+}
+
+
+@pytest.fixture
+def recipes(make_user, make_recipe, ingredients):
+    author = make_user('author')
+    return [
+        make_recipe(author, {ingredients[0]: 10}, name=f'Рецепт {number}')
+        for number in range(3)
+    ]
+
+
+def counter(recipe, model):
+    field = 'favorites_count' if model is Favorite else 'in_carts_count'
+    return getattr(Recipe.objects.get(pk=recipe.pk), field)
+
+
+@pytest.mark.parametrize('model', ENDPOINTS)
+def test_bulk_add_and_remove(model, recipes, make_user, api_client):
+    user = make_user('reader')
+    client = api_client(user)
+    first, second, third = recipes
+    model.objects.create(user=user, recipe=first)
+    missing = max(recipe.pk for recipe in recipes) + 1000
+
+    response = client.post(
+        ENDPOINTS[model],
+        {'ids': [first.pk, second.pk, second.pk, missing]}, format='json'
+    )
+
+    assert response.status_code == 200
+    assert response.data == {
+        'added': [second.pk], 'skipped': [first.pk], 'missing': [missing]
+    }
+    assert set(
+        model.objects.filter(user=user).values_list('recipe_id', flat=True)
+    ) == {first.pk, second.pk}
+    assert counter(second, model) == 1
+
+    response = client.delete(
+        ENDPOINTS[model], {'ids': [second.pk, third.pk]}, format='json'
+    )
+
+    assert response.status_code == 200
+    assert response.data == {
+        'removed': [second.pk], 'skipped': [third.pk], 'missing': []
+    }
+    assert list(
+        model.objects.filter(user=user).values_list('recipe_id', flat=True)
+    ) == [first.pk]
+    assert counter(second, model) == 0
+
+
+@pytest.mark.parametrize('ids', ([], ['x'], [0], [1] * (MAX_BULK_IDS + 1)))
+def test_bulk_rejects_invalid_ids(ids, make_user, api_client):
+    client = api_client(make_user('reader'))
+    response = client.post(ENDPOINTS[Favorite], {'ids': ids}, format='json')
+    assert response.status_code == 400
+
+
+def test_bulk_requires_authentication(api_client):
+    response = api_client().post(
+        ENDPOINTS[Favorite], {'ids': [1]}, format='json'
+    )
+    assert response.status_code == 401
+
+
+def test_recipe_save_keeps_separately_updated_fields(recipes):
+    stale = Recipe.objects.get(pk=recipes[0].pk)
+    counters.change(Favorite, [stale.pk], 2)
+    counters.change(ShoppingCart, [stale.pk], 1)
+    Recipe.objects.filter(pk=stale.pk).update(
+        image_renditions={'source': stale.image.name}
+    )
+
+    stale.name = 'Новое название'
+    stale.save()
+
+    recipe = Recipe.objects.get(pk=stale.pk)
+    assert recipe.name == 'Новое название'
+    assert (recipe.favorites_count, recipe.in_carts_count) == (2, 1)
+    assert recipe.image_renditions == {'source': stale.image.name}
+
+
+@pytest.mark.parametrize('model', ENDPOINTS)
+def test_admin_delete_groups_counter_updates(model, recipes, make_user,
+                                             client):
+    first, second, third = recipes
+    readers = [make_user(f'reader{number}') for number in range(3)]
+    for reader in readers:
+        model.objects.create(user=reader, recipe=first)
+        model.objects.create(user=reader, recipe=second)
+    model.objects.create(user=readers[0], recipe=third)
+    counters.reconcile()
+    client.force_login(make_user('staff', is_staff=True, is_superuser=True))
+    name = model._meta.model_name
+
+    with CaptureQueriesContext(connection) as captured:
+        response = client.post(f'/admin/foodmanager/{name}/', {
+            'action': 'delete_selected',
+            '_selected_action': model.objects.values_list('pk', flat=True),
+            'post': 'yes',
+        })
+
+    assert response.status_code == 302
+    assert not model.objects.exists()
+    assert [counter(recipe, model) for recipe in recipes] == [0, 0, 0]
+    table = Recipe._meta.db_table
+    assert len([
+        query for query in captured
+        if query['sql'].startswith(f'UPDATE "{table}"')
+    ]) == 2
@@ -0,0 +1,71 @@
+from django.conf import settings
+from django.core.cache.backends.filebased import FileBasedCache
+from foodmanager.catalogue import (VERSION_KEY, catalogue_version,
+                                   prefix_index)
+from foodmanager.models import Ingredient
+
+
+def test_catalogue_version_changes_on_commit(
+    db, django_capture_on_commit_callbacks
+):
+    before = catalogue_version()
+    with django_capture_on_commit_callbacks(execute=True) as callbacks:
+        Ingredient.objects.create(name='Новый ингредиент',
+                                  measurement_unit='г')
+        assert catalogue_version() == before
+    assert callbacks
+    assert catalogue_version() != before
+
+
+def test_catalogue_follows_version_from_other_process(ingredients):
+    prefix_index()
+    Ingredient.objects.create(name='Тестовый новый', measurement_unit='г')
+    other_process = FileBasedCache(
+        settings.CACHES['default']['LOCATION'], {}
+    )
+    other_process.set(VERSION_KEY, 'load-ingredients', timeout=None)
+
+    index = prefix_index()
+    assert index.version == 'load-ingredients'
+    assert [row['name'] for row in index.search('тестовый н')] == [
+        'Тестовый новый'
+    ]
+
+
+def test_catalogue_etag_differs_per_encoding(ingredients, api_client):
+    client = api_client()
+    plain = client.get('/api/ingredients/')
+    packed = client.get('/api/ingredients/', HTTP_ACCEPT_ENCODING='gzip')
+
+    assert packed['Content-Encoding'] == 'gzip'
+    assert plain['ETag'] != packed['ETag']
+    assert 'Accept-Encoding' in packed['Vary']
+
+    response = client.get(
+        '/api/ingredients/', HTTP_ACCEPT_ENCODING='gzip',
+        HTTP_IF_NONE_MATCH=packed['ETag']
+    )
+    assert response.status_code == 304
+    assert response['ETag'] == packed['ETag']
+    response = client.get(
+        '/api/ingredients/', HTTP_IF_NONE_MATCH=packed['ETag']
+    )
+    assert response.status_code == 200
+    assert response.content == plain.content
+
+
+def test_search_parameter_filters_like_name(ingredients, api_client):
+    client = api_client()
+    by_name = client.get(
+        '/api/ingredients/', {'name': 'ТЕСТОВЫЙ ингредиент 3'}
+    )
+    by_search = client.get(
+        '/api/ingredients/', {'search': 'тестовый ингредиент 3'}
+    )
+
+    assert by_name.status_code == by_search.status_code == 200
+    assert by_search.json() == by_name.json() == [{
+        'id': ingredients[3].pk,
+        'name': 'Тестовый ингредиент 3',
+        'measurement_unit': 'г',
+    }]
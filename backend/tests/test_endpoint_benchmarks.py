@@ -0,0 +1,202 @@
+import pytest
+from api import urls as api_urls
+from django.test import override_settings
+
+from .benchmarks import Case, check, measure
+
+RECIPE_DATA = {
+    'name': 'Новый рецепт',
+    'text': 'Описание нового рецепта.',
+    'cooking_time': 15,
+    'image': '{image}',
+    'ingredients': [
+        {'id': '{ingredient}', 'amount': 10},
+    ],
+}
+
+BULK_IDS = ['{recipe}', '{favorited_recipe}', '{cart_recipe}', '{own_recipe}']
+
+IMPLICIT_METHODS = ('head', 'options', 'trace')
+
+RESPONSE_CACHE = {'RESPONSE_CACHE_ALIAS': 'responses'}
+
+CASES = [
+    Case('api-root', 'get', '/api/'),
+    Case('login', 'post', '/api/auth/token/login/', client='anon',
+         data={'email': '{viewer_email}', 'password': '{password}'}),
+    Case('logout', 'post', '/api/auth/token/logout/', status=204),
+
+    Case('users-list', 'get', '/api/users/', client='anon',
+         page_sizes=(6, 50)),
+    Case('users-list', 'post', '/api/users/', client='anon', status=201,
+         data={'email': 'new@example.com', 'username': 'new_user',
+               'first_name': 'Имя', 'last_name': 'Фамилия',
+               'password': 'Secret-password-1'}),
+    Case('users-detail', 'get', '/api/users/{author}/', client='anon'),
+    Case('users-detail', 'put', '/api/users/{viewer}/',
+         data={'email': 'changed@example.com', 'username': 'changed',
+               'first_name': 'Имя', 'last_name': 'Фамилия'}),
+    Case('users-detail', 'patch', '/api/users/{viewer}/',
+         data={'first_name': 'Другое'}),
+    Case('users-detail', 'delete', '/api/users/{unfollowed_author}/',
+         status=204),
+    Case('users-me', 'get', '/api/users/me/'),
+    Case('users-set-password', 'post', '/api/users/set_password/',
+         data={'new_password': 'Another-password-2',
+               'current_password': '{password}'},
+         status=204),
+    Case('users-me-avatar', 'put', '/api/users/me/avatar/',
+         data={'avatar': '{image}'}),
+    Case('users-me-avatar', 'delete', '/api/users/me/avatar/', status=204),
+    Case('users-subscriptions', 'get',
+         '/api/users/subscriptions/?recipes_limit=3', page_sizes=(6, 50)),
+    Case('users-subscriptions', 'get',
+         '/api/users/subscriptions/?recipes_limit=3&cursor=',
+         page_sizes=(6, 50), label='cursor'),
+    Case('users-subscribe', 'post',
+         '/api/users/{unfollowed_author}/subscribe/', status=201),
+    Case('users-subscribe', 'delete',
+         '/api/users/{followed_author}/subscribe/', status=204),
+
+    Case('ingredients-list', 'get', '/api/ingredients/', client='anon'),
+    Case('ingredients-list', 'get', '/api/ingredients/?name=са',
+         client='anon', label='name'),
+    Case('ingredients-detail', 'get', '/api/ingredients/{ingredient}/',
+         client='anon'),
+
+    Case('recipes-list', 'get', '/api/recipes/', client='anon',
+         page_sizes=(6, 50), label='anon'),
+    Case('recipes-list', 'get', '/api/recipes/', client='anon',
+         page_sizes=(6, 50), label='anon-cached', settings=RESPONSE_CACHE),
+    Case('recipes-list', 'get', '/api/recipes/', page_sizes=(6, 50)),
+    Case('recipes-list', 'get', '/api/recipes/?ordering=popular',
+         client='anon', page_sizes=(6, 50), label='popular'),
+    Case('recipes-list', 'get', '/api/recipes/?ordering=popular&cursor=',
+         client='anon', page_sizes=(6, 50), label='popular-cursor'),
+    Case('recipes-list', 'get', '/api/recipes/?is_favorited=1',
+         page_sizes=(6, 50), label='favorited'),
+    Case('recipes-list', 'get', '/api/recipes/?author={author}',
+         page_sizes=(6, 50), label='author'),
+    Case('recipes-list', 'get', '/api/recipes/?cursor=', client='anon',
+         page_sizes=(6, 50), label='cursor'),
+    Case('recipes-list', 'get', '/api/recipes/?search=суп с грибами',
+         client='anon', page_sizes=(6, 50), label='search'),
+    Case('recipes-list', 'post', '/api/recipes/', data=RECIPE_DATA,
+         status=201),
+    Case('recipes-detail', 'get', '/api/recipes/{recipe}/'),
+    Case('recipes-detail', 'get', '/api/recipes/{recipe}/', client='anon',
+         label='anon'),
+    Case('recipes-detail', 'get', '/api/recipes/{recipe}/', client='anon',
+         label='anon-cached', settings=RESPONSE_CACHE),
+    Case('recipes-detail', 'put', '/api/recipes/{own_recipe}/',
+         data=RECIPE_DATA),
+    Case('recipes-detail', 'patch', '/api/recipes/{own_recipe}/',
+         data={'name': 'Изменённый рецепт',
+               'ingredients': [{'id': '{ingredient}', 'amount': 20}]}),
+    Case('recipes-detail', 'delete', '/api/recipes/{own_recipe}/',
+         status=204),
+    Case('recipes-get-link', 'get', '/api/recipes/{recipe}/get-link/'),
+    Case('recipes-feed', 'get', '/api/recipes/feed/', page_sizes=(6, 50)),
+    Case('recipes-can-cook', 'get',
+         '/api/recipes/can-cook/?ingredients={ingredients}', client='anon'),
+    Case('recipes-favorite', 'post', '/api/recipes/{recipe}/favorite/',
+         status=201),
+    Case('recipes-favorite', 'delete',
+         '/api/recipes/{favorited_recipe}/favorite/', status=204),
+    Case('recipes-shopping-cart', 'post',
+         '/api/recipes/{recipe}/shopping_cart/', status=201),
+    Case('recipes-shopping-cart', 'delete',
+         '/api/recipes/{cart_recipe}/shopping_cart/', status=204),
+    Case('recipes-favorite-bulk', 'post', '/api/recipes/favorite/bulk/',
+         data={'ids': BULK_IDS}),
+    Case('recipes-favorite-bulk', 'delete', '/api/recipes/favorite/bulk/',
+         data={'ids': BULK_IDS}),
+    Case('recipes-shopping-cart-bulk', 'post',
+         '/api/recipes/shopping_cart/bulk/', data={'ids': BULK_IDS}),
+    Case('recipes-shopping-cart-bulk', 'delete',
+         '/api/recipes/shopping_cart/bulk/', data={'ids': BULK_IDS}),
+    Case('recipes-download-shopping-cart', 'get',
+         '/api/recipes/download_shopping_cart/'),
+    Case('recipes-shopping-cart-export', 'post',
+         '/api/recipes/download_shopping_cart/export/', status=202),
+    Case('recipes-shopping-cart-export-detail', 'get',
+         '/api/recipes/download_shopping_cart/export/{export}/'),
+    Case('recipes-shopping-cart-export-file', 'get',
+         '/api/recipes/download_shopping_cart/export/{export}/file/'),
+
+    Case('recipe-short-link', 'get', '/s/{short_link}/', client='anon',
+         status=302),
+]
+
+ADMIN_CASES = [
+    Case(f'admin:foodmanager_{model}_changelist', 'get',
+         f'/admin/foodmanager/{model}/', client='admin')
+    for model in ('ingredient', 'user', 'recipe', 'recipeingredient',
+                  'favorite', 'shoppingcart', 'shoppingcarttotal',
+                  'subscription', 'shoppinglistexport')
+] + [
+    Case('admin:foodmanager_recipe_changelist', 'get',
+         '/admin/foodmanager/recipe/?author__id__exact={author}',
+         client='admin', label='author'),
+    Case('admin:foodmanager_recipe_changelist', 'get',
+         '/admin/foodmanager/recipe/?q=суп', client='admin', label='search'),
+    Case('admin:foodmanager_recipeingredient_changelist', 'get',
+         '/admin/foodmanager/recipeingredient/'
+         '?ingredient__id__exact={ingredient}',
+         client='admin', label='ingredient'),
+    Case('admin:foodmanager_recipe_change', 'get',
+         '/admin/foodmanager/recipe/{recipe}/change/', client='admin'),
+]
+
+
+def api_routes(patterns=api_urls.urlpatterns):
+    for pattern in patterns:
+        if hasattr(pattern, 'url_patterns'):
+            yield from api_routes(pattern.url_patterns)
+            continue
+        view_class = getattr(pattern.callback, 'cls', None)
+        methods = getattr(pattern.callback, 'actions', None) or [
+            method for method in view_class.http_method_names
+            if hasattr(view_class, method)
+        ]
+        for method in methods:
+            if method not in IMPLICIT_METHODS:
+                yield pattern.name, method
+
+
+def test_every_api_route_is_benchmarked():
+    covered = {(case.route, case.method) for case in CASES}
+    missing = sorted(set(api_routes()) - covered)
+    assert not missing, f'Нет бенчмарка для маршрутов: {missing}'
+
+
+def params(cases):
+    for case in cases:
+        yield pytest.param(case, id=case.id)
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize('case', params(CASES + ADMIN_CASES))
+def test_endpoint(request, case, clients, dataset):
+    with override_settings(**case.settings):
+        run_case(request, case, clients, dataset)
+
+
+def run_case(request, case, clients, dataset):
+    rounds = request.config.getoption('--benchmark-rounds')
+    client = clients[case.client]
+
+    if not case.page_sizes:
+        check(request, case.id, measure(client, case, dataset, rounds))
+        return
+
+    query_counts = {}
+    for page_size in case.page_sizes:
+        measurement = measure(client, case, dataset, rounds, page_size)
+        query_counts[page_size] = measurement.queries
+        check(request, f'{case.id}[limit={page_size}]', measurement)
+
+    assert len(set(query_counts.values())) == 1, (
+        f'{case.id}: число SQL-запросов растёт с размером страницы '
+        f'{query_counts}'
+    )
@@ -0,0 +1,97 @@
+from datetime import timedelta
+
+import pytest
+from api import exports
+from django.utils import timezone
+from foodmanager.models import ShoppingCart, ShoppingListExport
+
+EXPORT_URL = '/api/recipes/download_shopping_cart/export/'
+
+
+@pytest.fixture
+def buyer(make_user, make_recipe, ingredients):
+    author, buyer = make_user('author'), make_user('buyer')
+    recipe = make_recipe(author, {ingredients[0]: 100})
+    ShoppingCart.objects.create(user=buyer, recipe=recipe)
+    return buyer
+
+
+def claim(export_id):
+    claimed = dict(exports.claim(10))
+    assert export_id in claimed
+    return claimed[export_id]
+
+
+def age_heartbeat(export_id):
+    ShoppingListExport.objects.filter(pk=export_id).update(
+        heartbeat_at=timezone.now() - timedelta(days=1)
+    )
+
+
+def test_export_lifecycle(buyer, api_client):
+    client = api_client(buyer)
+
+    response = client.post(EXPORT_URL)
+    assert response.status_code == 202
+    assert response.data['status'] == ShoppingListExport.PENDING
+    export_id = response.data['id']
+    assert client.post(EXPORT_URL).data['id'] == export_id
+
+    assert exports.run(export_id, claim(export_id)) == ShoppingListExport.DONE
+
+    response = client.get(f'{EXPORT_URL}{export_id}/')
+    assert response.data['status'] == ShoppingListExport.DONE
+    assert response.data['download'].endswith(f'{export_id}/file/')
+    response = client.get(f'{EXPORT_URL}{export_id}/file/')
+    assert response.status_code == 200
+    assert b''.join(response.streaming_content).startswith(b'%PDF')
+    assert client.post(EXPORT_URL).status_code == 202
+
+
+def test_export_of_empty_cart_is_rejected(make_user, api_client):
+    response = api_client(make_user('buyer')).post(EXPORT_URL)
+    assert response.status_code == 400
+
+
+def test_stale_lease_cannot_finish(buyer):
+    export, _ = exports.enqueue(buyer)
+    first = claim(export.pk)
+    age_heartbeat(export.pk)
+
+    assert exports.requeue_stale() == 1
+    second = claim(export.pk)
+
+    assert exports.run(export.pk, first) is None
+    export.refresh_from_db()
+    assert export.status == ShoppingListExport.RUNNING
+    assert export.lease == second
+    assert not export.file
+
+    assert exports.run(export.pk, second) == ShoppingListExport.DONE
+    export.refresh_from_db()
+    assert export.lease is None and export.file
+
+
+def test_heartbeat_keeps_running_export(buyer):
+    export, _ = exports.enqueue(buyer)
+    lease = claim(export.pk)
+    age_heartbeat(export.pk)
+
+    assert exports.heartbeat([lease]) == 1
+    assert exports.requeue_stale() == 0
+    assert exports.run(export.pk, lease) == ShoppingListExport.DONE
+
+
+def test_expire_removes_old_exports(buyer):
+    export, _ = exports.enqueue(buyer)
+    exports.run(export.pk, claim(export.pk))
+    export.refresh_from_db()
+    storage, name = export.file.storage, export.file.name
+
+    assert exports.expire() == 0
+    ShoppingListExport.objects.filter(pk=export.pk).update(
+        finished_at=timezone.now() - timedelta(days=30)
+    )
+    assert exports.expire() == 1
+    assert not ShoppingListExport.objects.filter(pk=export.pk).exists()
+    assert not storage.exists(name)
@@ -0,0 +1,103 @@
+from datetime import timedelta
+
+import pytest
+from django.test import override_settings
+from django.utils import timezone
+from foodmanager import feed
+from foodmanager.models import FeedEntry, Recipe
+
+FEED_URL = '/api/recipes/feed/'
+
+
+@pytest.fixture
+def people(make_user, api_client):
+    reader = make_user('reader')
+    return reader, make_user('pushed'), make_user('pulled'), api_client(reader)
+
+
+def make_recipes(make_recipe, author, count, start):
+    """Рецепты автора с датами создания ``start``, ``start`` + 1 минута..."""
+    recipes = []
+    for number in range(count):
+        recipe = make_recipe(author, {}, name=f'{author.username} {number}')
+        Recipe.objects.filter(pk=recipe.pk).update(
+            created_at=start + timedelta(minutes=number)
+        )
+        recipes.append(recipe.pk)
+    return recipes
+
+
+def read_feed(client, limit):
+    ids, url = [], f'{FEED_URL}?limit={limit}'
+    while url:
+        response = client.get(url)
+        assert response.status_code == 200
+        assert 'count' not in response.data
+        ids += [recipe['id'] for recipe in response.data['results']]
+        url = response.data['next']
+    return ids
+
+
+def subscribe(client, author):
+    response = client.post(f'/api/users/{author.pk}/subscribe/')
+    assert response.status_code == 201
+
+
+def test_subscription_backfills_and_unsubscribe_clears(
+    people, make_recipe
+):
+    reader, author, _, client = people
+    recipes = make_recipes(make_recipe, author, 3, timezone.now())
+
+    subscribe(client, author)
+    assert read_feed(client, 2) == recipes[::-1]
+
+    response = client.delete(f'/api/users/{author.pk}/subscribe/')
+    assert response.status_code == 204
+    assert not FeedEntry.objects.filter(user=reader).exists()
+    assert read_feed(client, 2) == []
+
+
+def test_new_recipe_fans_out_to_followers(
+    people, make_recipe, django_capture_on_commit_callbacks
+):
+    reader, author, _, client = people
+    subscribe(client, author)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        recipe = make_recipe(author, {})
+
+    assert FeedEntry.objects.filter(user=reader, recipe=recipe).exists()
+    assert read_feed(client, 6) == [recipe.pk]
+
+
+def test_feed_merges_pushed_and_pulled_authors(people, make_recipe):
+    reader, pushed, pulled, client = people
+    start = timezone.now() - timedelta(days=1)
+    subscribe(client, pushed)
+    subscribe(client, pulled)
+    with override_settings(FEED_FANOUT_MAX_FOLLOWERS=0):
+        feed.rebuild(pulled.pk)
+        pulled_ids = make_recipes(make_recipe, pulled, 4, start)
+    pushed_ids = make_recipes(
+        make_recipe, pushed, 4, start + timedelta(seconds=30)
+    )
+    feed.rebuild(pushed.pk)
+
+    assert not Recipe.objects.filter(pk__in=pulled_ids, in_timelines=True)
+    assert not FeedEntry.objects.filter(author=pulled).exists()
+    expected = [
+        recipe_id
+        for pair in zip(pushed_ids, pulled_ids)
+        for recipe_id in reversed(pair)
+    ][::-1]
+    for limit in (1, 3, 8):
+        assert read_feed(client, limit) == expected
+
+    feed.rebuild(pulled.pk)
+    assert FeedEntry.objects.filter(user=reader, author=pulled).count() == 4
+    assert read_feed(client, 3) == expected
+
+
+def test_feed_requires_authentication(api_client):
+    assert api_client().get(FEED_URL).status_code == 401
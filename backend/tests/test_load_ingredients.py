@@ -0,0 +1,102 @@
+import json
+from io import StringIO
+
+import pytest
+from django.core.management import CommandError, call_command
+from foodmanager.management.commands import load_ingredients
+from foodmanager.models import Ingredient
+
+ROWS = [
+    {'name': 'Тест-соль морская', 'measurement_unit': 'г'},
+    {'name': 'Тест-молоко', 'measurement_unit': 'мл'},
+    {'name': 'Тест-соль морская', 'measurement_unit': 'г'},
+    {'name': 'Тест-без единицы'},
+    {'name': 'Тест-яйцо', 'measurement_unit': 'шт.'},
+]
+NAMES = {'Тест-соль морская', 'Тест-молоко', 'Тест-яйцо'}
+
+
+@pytest.fixture(autouse=True)
+def small_reads(monkeypatch):
+    """Маленькие порции чтения, чтобы элементы попадали на границы."""
+    monkeypatch.setattr(load_ingredients, 'READ_SIZE', 7)
+
+
+def load(path, *args):
+    out = StringIO()
+    call_command('load_ingredients', str(path), *args, stdout=out)
+    return out.getvalue().splitlines()[-1]
+
+
+def loaded():
+    return set(
+        Ingredient.objects.filter(name__startswith='Тест-')
+        .values_list('name', flat=True)
+    )
+
+
+def test_json_load_is_idempotent(db, tmp_path):
+    path = tmp_path / 'ingredients.json'
+    path.write_text(
+        json.dumps(ROWS, ensure_ascii=False, indent=1), encoding='utf-8'
+    )
+
+    assert load(path, '--dry-run', '--batch-size', '2') == (
+        'Будет добавлено: 3, уже есть: 1, пропущено с ошибками: 1.'
+    )
+    assert loaded() == set()
+
+    assert load(path, '--batch-size', '2') == (
+        'Добавлено: 3, уже есть: 1, пропущено с ошибками: 1.'
+    )
+    assert loaded() == NAMES
+    assert load(path) == (
+        'Добавлено: 0, уже есть: 4, пропущено с ошибками: 1.'
+    )
+    assert Ingredient.objects.get(name='Тест-яйцо').measurement_unit == 'шт.'
+
+
+def test_csv_load(db, tmp_path):
+    path = tmp_path / 'ingredients.csv'
+    path.write_text(
+        'name,measurement_unit\n'
+        'Тест-соль морская,г\n'
+        '"Тест-молоко",мл\n'
+        'Тест-лишнее,г,г\n'
+        'Тест-яйцо,шт.\n',
+        encoding='utf-8'
+    )
+
+    assert load(path) == (
+        'Добавлено: 3, уже есть: 0, пропущено с ошибками: 1.'
+    )
+    assert loaded() == NAMES
+
+
+@pytest.mark.parametrize('content', [
+    '',
+    '{"name": "Тест-соль", "measurement_unit": "г"}',
+    '[{"name": "Тест-соль", "measurement_unit": "г"},]',
+    '[{"name": "Тест-соль", "measurement_unit": "г"} '
+    '{"name": "Тест-перец", "measurement_unit": "г"}]',
+    '[{"name": "Тест-соль", "measurement_unit": "г"},,'
+    '{"name": "Тест-перец", "measurement_unit": "г"}]',
+    '[,{"name": "Тест-соль", "measurement_unit": "г"}]',
+    '[{"name": "Тест-соль", "measurement_unit": "г"}',
+    '[{"name": "Тест-соль", "measurement_unit": "г"}] []',
+])
+def test_malformed_json_is_rejected(db, tmp_path, content):
+    path = tmp_path / 'ingredients.json'
+    path.write_text(content, encoding='utf-8')
+
+    with pytest.raises(CommandError):
+        load(path)
+    assert loaded() == set()
+
+
+def test_empty_json_array(db, tmp_path):
+    path = tmp_path / 'ingredients.json'
+    path.write_text(' [ \n ] \n', encoding='utf-8')
+    assert load(path) == (
+        'Добавлено: 0, уже есть: 0, пропущено с ошибками: 0.'
+    )
@@ -0,0 +1,116 @@
+import random
+
+import pytest
+from django.test import override_settings
+from foodmanager import recipe_index as module
+from foodmanager.models import Recipe, RecipeIngredient
+from foodmanager.recipe_index import RecipeIngredientIndex, recipe_index
+
+from .benchmarks import PNG_1PX
+
+
+def snapshot(index):
+    return (
+        {key: list(value) for key, value in index.postings.items()},
+        dict(index.sizes),
+    )
+
+
+def test_replace_recipes_matches_rebuild():
+    rng = random.Random(7)
+    pairs = {
+        (ingredient_id, recipe_id)
+        for recipe_id in range(1, 60)
+        for ingredient_id in rng.sample(range(1, 30), rng.randint(1, 8))
+    }
+    index = RecipeIngredientIndex(sorted(pairs))
+    for _ in range(20):
+        changed = set(rng.sample(range(1, 70), 5))
+        pairs = {pair for pair in pairs if pair[1] not in changed}
+        new = {
+            (ingredient_id, recipe_id)
+            for recipe_id in changed if rng.random() < 0.7
+            for ingredient_id in rng.sample(range(1, 35), rng.randint(1, 8))
+        }
+        pairs |= new
+        index.replace_recipes(changed, list(new))
+        assert snapshot(index) == snapshot(
+            RecipeIngredientIndex(sorted(pairs))
+        )
+
+
+def test_replace_recipes_keeps_old_sizes_for_readers():
+    index = RecipeIngredientIndex([(1, 10), (2, 10), (1, 11)])
+    sizes = index.sizes
+
+    index.replace_recipes([10], [])
+
+    assert sizes == {10: 2, 11: 1}
+    assert index.sizes == {11: 1}
+    assert index.cookable([1, 2], 5) == [(11, 1, 1)]
+
+
+@pytest.fixture
+def fresh_index(monkeypatch, db):
+    monkeypatch.setattr(module, 'current_index', None)
+
+
+def cookable(ingredients, limit=10):
+    return [
+        recipe_id for recipe_id, _, _ in recipe_index().cookable(
+            [ingredient.pk for ingredient in ingredients], limit
+        )
+    ]
+
+
+def test_saved_recipes_update_index_in_place(
+    fresh_index, make_user, make_recipe, ingredients, api_client,
+    django_capture_on_commit_callbacks
+):
+    author = make_user('author')
+    first = make_recipe(author, {ingredients[0]: 1})
+    index = recipe_index()
+
+    with django_capture_on_commit_callbacks(execute=True):
+        response = api_client(author).post('/api/recipes/', {
+            'name': 'Новый рецепт',
+            'text': 'Описание.',
+            'cooking_time': 5,
+            'image': PNG_1PX,
+            'ingredients': [{'id': ingredients[0].pk, 'amount': 1},
+                            {'id': ingredients[1].pk, 'amount': 1}],
+        }, format='json')
+    assert response.status_code == 201
+    second = Recipe.objects.get(pk=response.data['id'])
+    assert recipe_index() is index
+    assert cookable(ingredients[:2])[:2] == [second.pk, first.pk]
+
+    with django_capture_on_commit_callbacks(execute=True):
+        RecipeIngredient.objects.filter(
+            recipe=second, ingredient=ingredients[0]
+        ).delete()
+    assert index.sizes[second.pk] == 1
+    assert second.pk not in cookable(ingredients[:1])
+
+    with django_capture_on_commit_callbacks(execute=True):
+        first.delete()
+    assert recipe_index() is index
+    assert first.pk not in cookable(ingredients[:2])
+
+
+def test_version_change_rebuilds_in_background(
+    fresh_index, monkeypatch, make_user, make_recipe, ingredients
+):
+    make_recipe(make_user('author'), {ingredients[0]: 1})
+    index = recipe_index()
+    started = []
+    monkeypatch.setattr(module, 'start_rebuild', started.append)
+    monkeypatch.setattr(module, 'recipe_index_version', lambda: 'new')
+
+    with override_settings(RECIPE_INDEX_BACKGROUND_REBUILD=True):
+        assert recipe_index() is index
+    assert started == ['new']
+
+    module.rebuild('new')
+    assert recipe_index() is not index
+    assert recipe_index().version == 'new'
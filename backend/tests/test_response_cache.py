@@ -0,0 +1,106 @@
+import pytest
+from api.response_cache import response_cache
+from api.serializers import RecipeCreateUpdateSerializer
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.test import override_settings
+from foodmanager.content_versions import recipe_key
+from foodmanager.utils import require_shared_cache
+from foodmanager.models import RecipeIngredient
+
+from .benchmarks import PNG_1PX
+
+
+@pytest.fixture
+def cached():
+    with override_settings(RESPONSE_CACHE_ALIAS='responses'):
+        cache.clear()
+        response_cache().clear()
+        yield
+
+
+def test_local_version_cache_is_refused():
+    local = {'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'
+    }}
+    with override_settings(CACHES=local):
+        with pytest.raises(ImproperlyConfigured):
+            require_shared_cache()
+
+
+def test_ingredient_removal_invalidates_recipe(
+    cached, make_user, make_recipe, ingredients, api_client,
+    django_assert_num_queries, django_capture_on_commit_callbacks
+):
+    recipe = make_recipe(
+        make_user('author'), {ingredients[0]: 10, ingredients[1]: 20}
+    )
+    client = api_client()
+    url = f'/api/recipes/{recipe.pk}/'
+
+    first = client.get(url)
+    with django_assert_num_queries(0):
+        assert client.get(url).content == first.content
+    assert len(first.json()['ingredients']) == 2
+
+    with django_capture_on_commit_callbacks(execute=True):
+        RecipeIngredient.objects.filter(
+            recipe=recipe, ingredient=ingredients[1]
+        ).delete()
+
+    response = client.get(url)
+    assert [item['id'] for item in response.json()['ingredients']] == [
+        ingredients[0].pk
+    ]
+
+
+def test_missing_recipes_create_no_versions(
+    cached, make_user, make_recipe, api_client,
+    django_capture_on_commit_callbacks
+):
+    recipe = make_recipe(make_user('author'), {})
+    client = api_client()
+    missing = recipe.pk + 1000
+
+    for pk in (missing, 'abc'):
+        assert client.get(f'/api/recipes/{pk}/').status_code == 404
+    assert cache.get(recipe_key(missing)) is None
+
+    assert client.get(f'/api/recipes/{recipe.pk}/').status_code == 200
+    assert cache.get(recipe_key(recipe.pk)) is not None
+    with django_capture_on_commit_callbacks(execute=True):
+        recipe.delete()
+    assert cache.get(recipe_key(recipe.pk)) is None
+
+
+@pytest.mark.django_db(transaction=True)
+def test_read_during_create_is_not_cached_for_good(
+    cached, make_user, ingredients, api_client, monkeypatch
+):
+    """Анонимный запрос между вставкой рецепта и его ингредиентов не
+    остаётся в кэше: версия рецепта меняется после фиксации всего
+    создания.
+    """
+    anonymous = api_client()
+    create_ingredients = RecipeCreateUpdateSerializer.create_ingredients
+
+    def read_then_create(serializer, recipe, ingredients_data):
+        anonymous.get(f'/api/recipes/{recipe.pk}/')
+        create_ingredients(serializer, recipe, ingredients_data)
+
+    monkeypatch.setattr(
+        RecipeCreateUpdateSerializer, 'create_ingredients', read_then_create
+    )
+    response = api_client(make_user('author')).post('/api/recipes/', {
+        'name': 'Новый рецепт',
+        'text': 'Описание рецепта.',
+        'cooking_time': 15,
+        'image': PNG_1PX,
+        'ingredients': [{'id': ingredients[0].pk, 'amount': 10}],
+    }, format='json')
+    assert response.status_code == 201
+
+    recipe = anonymous.get(f'/api/recipes/{response.data["id"]}/').json()
+    assert [item['id'] for item in recipe['ingredients']] == [
+        ingredients[0].pk
+    ]
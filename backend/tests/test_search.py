@@ -0,0 +1,76 @@
+import pytest
+from django.apps import apps
+from django.db import connection
+from django.db.models.signals import post_migrate
+from foodmanager import search
+
+SEARCH_URL = '/api/recipes/'
+
+
+@pytest.fixture
+def recipes(make_user, make_recipe, ingredients):
+    author = make_user('author')
+    in_name = make_recipe(
+        author, {ingredients[0]: 10}, name='Зюзюбрик печёный',
+        text='Запекать в духовке.'
+    )
+    in_text = make_recipe(
+        author, {ingredients[0]: 10}, name='Салат',
+        text='Подавать вместе с зюзюбриком.'
+    )
+    other = make_recipe(
+        author, {ingredients[0]: 10}, name='Компот', text='Сварить.'
+    )
+    return author, in_name, in_text, other
+
+
+def found(client, text):
+    response = client.get(SEARCH_URL, {'search': text, 'limit': 50})
+    assert response.status_code == 200
+    return [recipe['id'] for recipe in response.data['results']]
+
+
+def test_search_ranks_name_above_text(recipes, api_client):
+    _, in_name, in_text, _ = recipes
+    client = api_client()
+
+    assert found(client, 'зюзюбрик') == [in_name.pk, in_text.pk]
+    assert found(client, 'ЗЮЗЮБРИК печёный') == [in_name.pk]
+    assert found(client, 'зюзюбрик компот') == []
+
+
+@pytest.mark.parametrize('text', ['!!!', '  ', '"*'])
+def test_search_without_words_finds_nothing(recipes, api_client, text):
+    assert found(api_client(), text) == []
+
+
+def test_search_follows_rename(recipes, api_client, ingredients):
+    author, _, _, other = recipes
+    client = api_client()
+    assert found(client, 'кисель') == []
+
+    response = api_client(author).patch(f'/api/recipes/{other.pk}/', {
+        'name': 'Кисель',
+        'ingredients': [{'id': ingredients[0].pk, 'amount': 10}],
+    }, format='json')
+    assert response.status_code == 200
+
+    assert found(client, 'кисель') == [other.pk]
+    assert found(client, 'компот') == []
+
+
+def test_post_migrate_restores_search_triggers(recipes, api_client):
+    _, _, _, other = recipes
+    with connection.cursor() as cursor:
+        for trigger in search.FTS_TRIGGERS:
+            cursor.execute(f'DROP TRIGGER {trigger}')
+
+    app_config = apps.get_app_config('foodmanager')
+    post_migrate.send(
+        sender=app_config, app_config=app_config, verbosity=0,
+        interactive=False, using=connection.alias, apps=apps, plan=[]
+    )
+    other.name = 'Морс'
+    other.save()
+
+    assert found(api_client(), 'морс') == [other.pk]
@@ -0,0 +1,120 @@
+from time import perf_counter
+
+import pytest
+from api.serializers import FastRecipeSerializer, RecipeSerializer
+from api.views import RecipeViewSet
+from django.contrib.auth.models import AnonymousUser
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from foodmanager.models import Recipe, User
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from .benchmarks import Measurement, check, percentile
+
+PAGE_SIZES = (6, 50, 200)
+SERIALIZERS = {'default': RecipeSerializer, 'fast': FastRecipeSerializer}
+
+
+def renditions_of(path):
+    stem = path.rsplit('.', 1)[0]
+    return {
+        'source': path,
+        **{
+            name: {
+                extension: f'{stem}-{name}.{extension}'
+                for extension in ('webp', 'jpeg')
+            }
+            for name in ('thumbnail', 'card', 'full')
+        },
+    }
+
+
+@pytest.fixture
+def renditions(dataset, db):
+    """Копии изображений у части рецептов и аватары у части авторов,
+    чтобы сравнение покрывало и эти поля.
+    """
+    recipes = Recipe.objects.order_by('-created_at')[:max(PAGE_SIZES)]
+    for recipe in list(recipes)[::3]:
+        Recipe.objects.filter(pk=recipe.pk).update(
+            image_renditions=renditions_of(recipe.image.name)
+        )
+    for user in User.objects.order_by('id')[::2]:
+        avatar = f'users/avatars/{user.pk}.png'
+        User.objects.filter(pk=user.pk).update(
+            avatar=avatar, avatar_renditions=renditions_of(avatar)
+        )
+
+
+def recipe_page(user, size):
+    """Рецепты первой страницы списка так, как их выбирает API."""
+    request = Request(APIRequestFactory().get('/api/recipes/'))
+    request.user = user
+    view = RecipeViewSet(
+        request=request, action='list', kwargs={}, format_kwarg=None
+    )
+    return request, list(view.get_queryset()[:size])
+
+
+def render(serializer_class, request, recipes, many=True):
+    serializer = serializer_class(
+        recipes, many=many, context={'request': request}
+    )
+    return JSONRenderer().render(serializer.data)
+
+
+@pytest.mark.parametrize('client', ('anon', 'user'))
+def test_fast_serializer_matches_default(client, dataset, renditions):
+    user = (
+        AnonymousUser() if client == 'anon'
+        else User.objects.get(pk=dataset.viewer)
+    )
+    request, recipes = recipe_page(user, max(PAGE_SIZES))
+
+    content = render(FastRecipeSerializer, request, recipes)
+    assert content == render(RecipeSerializer, request, recipes)
+    assert b'"thumbnail"' in content and b'/media/users/avatars/' in content
+    assert render(FastRecipeSerializer, request, recipes[0], False) == (
+        render(RecipeSerializer, request, recipes[0], False)
+    )
+    plain = Recipe.objects.get(pk=recipes[0].pk)
+    assert render(FastRecipeSerializer, request, plain, False) == (
+        render(RecipeSerializer, request, plain, False)
+    )
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize('page_size', PAGE_SIZES)
+def test_serializer_speed(request, page_size, dataset, renditions):
+    rounds = request.config.getoption('--benchmark-rounds')
+    api_request, recipes = recipe_page(
+        User.objects.get(pk=dataset.viewer), page_size
+    )
+
+    medians = {}
+    for name, serializer_class in SERIALIZERS.items():
+        latencies = []
+        queries = 0
+        for round_number in range(rounds + 1):
+            with CaptureQueriesContext(connection) as captured:
+                started = perf_counter()
+                render(serializer_class, api_request, recipes)
+                elapsed = perf_counter() - started
+            if round_number:
+                latencies.append(elapsed * 1000)
+                queries = max(queries, len(captured))
+        measurement = Measurement(
+            queries=queries,
+            sql_ms=0,
+            p50_ms=percentile(latencies, 0.5),
+            p95_ms=percentile(latencies, 0.95),
+        )
+        medians[name] = measurement.p50_ms
+        check(
+            request, f'serialize recipes[{name}][limit={page_size}]',
+            measurement
+        )
+
+    assert medians['fast'] < medians['default'], medians
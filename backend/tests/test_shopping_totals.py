@@ -0,0 +1,127 @@
+import pytest
+from foodmanager import shopping_totals
+from foodmanager.models import RecipeIngredient, ShoppingCartTotal
+
+
+def totals(user):
+    return dict(
+        ShoppingCartTotal.objects.filter(user=user)
+        .values_list('ingredient_id', 'amount')
+    )
+
+
+@pytest.fixture
+def cart(make_user, make_recipe, ingredients, api_client):
+    """Два рецепта с общим ингредиентом в списке покупок покупателя."""
+    author, buyer = make_user('author'), make_user('buyer')
+    first = make_recipe(author, {ingredients[0]: 100, ingredients[1]: 2})
+    second = make_recipe(author, {ingredients[0]: 50})
+    client = api_client(buyer)
+    for recipe in (first, second):
+        response = client.post(f'/api/recipes/{recipe.pk}/shopping_cart/')
+        assert response.status_code == 201
+    return client, author, buyer, first, second
+
+
+def test_totals_follow_cart(cart, ingredients):
+    client, _, buyer, first, _ = cart
+    assert totals(buyer) == {ingredients[0].pk: 150, ingredients[1].pk: 2}
+
+    response = client.delete(f'/api/recipes/{first.pk}/shopping_cart/')
+
+    assert response.status_code == 204
+    assert totals(buyer) == {ingredients[0].pk: 50}
+
+
+def test_bulk_cart_updates_totals(cart, ingredients):
+    client, _, buyer, first, second = cart
+    response = client.delete(
+        '/api/recipes/shopping_cart/bulk/',
+        {'ids': [first.pk, second.pk]}, format='json'
+    )
+    assert response.status_code == 200
+    assert totals(buyer) == {}
+
+    client.post(
+        '/api/recipes/shopping_cart/bulk/', {'ids': [second.pk]},
+        format='json'
+    )
+    assert totals(buyer) == {ingredients[0].pk: 50}
+
+
+def test_recipe_edit_updates_totals(cart, ingredients, api_client):
+    _, author, buyer, first, _ = cart
+    response = api_client(author).patch(
+        f'/api/recipes/{first.pk}/',
+        {'ingredients': [{'id': ingredients[0].pk, 'amount': 10},
+                         {'id': ingredients[2].pk, 'amount': 3}]},
+        format='json'
+    )
+    assert response.status_code == 200
+    assert totals(buyer) == {ingredients[0].pk: 60, ingredients[2].pk: 3}
+
+
+def test_recipe_delete_updates_totals(cart, ingredients, api_client):
+    _, author, buyer, first, _ = cart
+    response = api_client(author).delete(f'/api/recipes/{first.pk}/')
+    assert response.status_code == 204
+    assert totals(buyer) == {ingredients[0].pk: 50}
+
+
+def test_shopping_list_sums_totals(cart):
+    client, *_ = cart
+    response = client.get('/api/recipes/download_shopping_cart/')
+    content = b''.join(response.streaming_content) if (
+        response.streaming
+    ) else response.content
+    assert response.status_code == 200
+    assert content.startswith(b'%PDF')
+
+
+def test_recipe_ingredient_admin_updates_totals(cart, ingredients,
+                                                make_user, client):
+    _, _, buyer, first, _ = cart
+    client.force_login(make_user('staff', is_staff=True, is_superuser=True))
+    row = RecipeIngredient.objects.get(
+        recipe=first, ingredient=ingredients[0]
+    )
+
+    response = client.post(
+        f'/admin/foodmanager/recipeingredient/{row.pk}/change/',
+        {'recipe': first.pk, 'ingredient': ingredients[3].pk, 'amount': 7}
+    )
+    assert response.status_code == 302
+    assert totals(buyer) == {
+        ingredients[0].pk: 50, ingredients[1].pk: 2, ingredients[3].pk: 7
+    }
+
+    response = client.post(
+        f'/admin/foodmanager/recipeingredient/{row.pk}/delete/',
+        {'post': 'yes'}
+    )
+    assert response.status_code == 302
+    assert totals(buyer) == {ingredients[0].pk: 50, ingredients[1].pk: 2}
+
+    response = client.post(
+        '/admin/foodmanager/recipeingredient/add/',
+        {'recipe': first.pk, 'ingredient': ingredients[4].pk, 'amount': 5}
+    )
+    assert response.status_code == 302
+    assert totals(buyer) == {
+        ingredients[0].pk: 50, ingredients[1].pk: 2, ingredients[4].pk: 5
+    }
+
+
+def test_reconcile_fixes_drift(cart, ingredients):
+    _, _, buyer, *_ = cart
+    ShoppingCartTotal.objects.filter(
+        user=buyer, ingredient=ingredients[0]
+    ).update(amount=1)
+    ShoppingCartTotal.objects.filter(
+        user=buyer, ingredient=ingredients[1]
+    ).delete()
+
+    assert shopping_totals.reconcile([buyer.pk], fix=False) == 2
+    assert shopping_totals.reconcile([buyer.pk]) == 2
+    assert totals(buyer) == {ingredients[0].pk: 150, ingredients[1].pk: 2}
+    assert shopping_totals.reconcile([buyer.pk]) == 0
@@ -0,0 +1,129 @@
+import json
+
+import pytest
+from django.core.management import CommandError, call_command
+from foodmanager import counters, shopping_totals
+from foodmanager.models import (Favorite, FeedEntry, Ingredient, Recipe,
+                                ShoppingCart, ShoppingCartTotal,
+                                Subscription, User)
+
+
+@pytest.fixture
+def library(make_user, make_recipe, ingredients):
+    """Три пользователя с рецептами и связями в пустой базе: данные
+    бенчмарков удаляются внутри откатываемой транзакции теста.
+    """
+    Recipe.objects.all().delete()
+    User.objects.all().delete()
+    cook, baker, reader = (
+        make_user(name)
+        for name in ('cook', 'baker', 'reader')
+    )
+    soup = make_recipe(cook, {ingredients[0]: 100, ingredients[1]: 2},
+                       name='Суп')
+    make_recipe(cook, {ingredients[2]: 30}, name='Каша')
+    pie = make_recipe(baker, {ingredients[0]: 50, ingredients[4]: 1},
+                      name='Пирог')
+    Favorite.objects.create(user=reader, recipe=soup)
+    Favorite.objects.create(user=cook, recipe=pie)
+    ShoppingCart.objects.create(user=reader, recipe=soup)
+    ShoppingCart.objects.create(user=reader, recipe=pie)
+    Subscription.objects.create(user=reader, author=cook)
+    Subscription.objects.create(user=cook, author=baker)
+    counters.reconcile()
+    shopping_totals.reconcile([reader.pk])
+    return cook, baker, reader
+
+
+def snapshot():
+    """Данные базы без id, которые импорт назначает заново."""
+    return {
+        'users': {
+            user.email: (user.username, user.first_name, user.password)
+            for user in User.objects.all()
+        },
+        'recipes': {
+            recipe.name: (
+                recipe.author.email, recipe.text, recipe.image.name,
+                recipe.cooking_time, recipe.created_at,
+                recipe.favorites_count, recipe.in_carts_count,
+                sorted(
+                    (item.ingredient.name, item.amount)
+                    for item in recipe.recipe_ingredients.all()
+                )
+            )
+            for recipe in Recipe.objects.all()
+        },
+        'favorites': relation_pairs(Favorite, 'recipe__name'),
+        'carts': relation_pairs(ShoppingCart, 'recipe__name'),
+        'subscriptions': relation_pairs(Subscription, 'author__email'),
+        'totals': set(ShoppingCartTotal.objects.values_list(
+            'user__email', 'ingredient__name', 'amount'
+        )),
+        'feeds': relation_pairs(FeedEntry, 'recipe__name'),
+    }
+
+
+def relation_pairs(model, target):
+    return set(model.objects.values_list('user__email', target))
+
+
+def clear(ingredient):
+    Recipe.objects.all().delete()
+    User.objects.all().delete()
+    ingredient.delete()
+
+
+def test_export_import_round_trip(library, ingredients, tmp_path):
+    path = tmp_path / 'recipes.ndjson'
+    before = snapshot()
+    assert before['totals'] and before['feeds']
+
+    call_command('export_recipes', str(path), relations=True, verbosity=0)
+    clear(ingredients[4])
+    call_command('import_recipes', str(path), batch_size=2, verbosity=0)
+
+    assert snapshot() == before
+    assert Ingredient.objects.filter(name=ingredients[4].name).exists()
+
+
+def test_export_without_relations(library, tmp_path):
+    path = tmp_path / 'recipes.ndjson'
+    cook, baker, _ = library
+
+    call_command('export_recipes', str(path), verbosity=0)
+
+    records = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [record['type'] for record in records] == ['user'] * 2 + [
+        'recipe'
+    ] * 3
+    assert [record['email'] for record in records[:2]] == [
+        cook.email, baker.email
+    ]
+    soup = records[2]
+    assert (soup['name'], soup['author']) == ('Суп', cook.pk)
+    assert soup['ingredients'][0] == {
+        'name': 'Тестовый ингредиент 0', 'measurement_unit': 'г',
+        'amount': 100,
+    }
+
+
+def test_import_maps_existing_users_by_email(library, tmp_path):
+    path = tmp_path / 'recipes.ndjson'
+    cook, _, _ = library
+    call_command('export_recipes', str(path), verbosity=0)
+    Recipe.objects.all().delete()
+
+    call_command('import_recipes', str(path), verbosity=0)
+
+    assert User.objects.count() == 3
+    assert set(cook.recipes.values_list('name', flat=True)) == {
+        'Суп', 'Каша'
+    }
+
+
+def test_import_rejects_unknown_records(db, tmp_path):
+    path = tmp_path / 'recipes.ndjson'
+    path.write_text('{"type": "comment"}\n')
+    with pytest.raises(CommandError):
+        call_command('import_recipes', str(path), verbosity=0)